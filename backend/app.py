@@ -1,14 +1,26 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select
+import asyncio
 import json
+import time
 import uuid
-from typing import Dict
+from contextlib import aclosing
+from typing import Awaitable, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 
 from .auth.auth_service import auth_service
 from .services.gemini_service import GeminiService
 from .services.rag_service import RAGService
 from .services.tool_service import ToolService
+from .services.response_cache import SemanticResponseCache
+from .services.cache_service import cache_service
+from .services.conversation_service import conversation_service
+from .services.message_journal import MessageJournal
+from .services.history_manager import HistoryManager
+from .services.connection_manager import ClientConnection, ConnectionManager
+from .config import settings
+from .database.db import AsyncSessionLocal, async_engine
 from .models.conversation import Conversation, Message
 
 app = FastAPI()
@@ -20,38 +32,290 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Initialize services
 gemini_service = GeminiService()
 rag_service = RAGService()
 tool_service = ToolService()
+response_cache = SemanticResponseCache(
+    threshold=settings.RESPONSE_CACHE_THRESHOLD,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    max_entries=settings.RESPONSE_CACHE_SIZE,
+    scope=settings.RESPONSE_CACHE_SCOPE
+)
+
+message_journal = MessageJournal(
+    AsyncSessionLocal,
+    flush_interval=settings.MESSAGE_JOURNAL_FLUSH_INTERVAL,
+    max_pending=settings.MESSAGE_JOURNAL_MAX_PENDING,
+    max_buffered=settings.MESSAGE_JOURNAL_MAX_BUFFERED,
+    write_through=settings.MESSAGE_JOURNAL_MODE == "write_through"
+)
+
+async def _load_recent_messages(conversation_id: str, limit: int) -> List[Message]:
+    """Latest persisted turns plus any the journal has not written yet"""
+    # Snapshot first: a row committed while the query runs is then in one list or both
+    pending = message_journal.pending_for(conversation_id)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Message)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.created_at.desc())
+            .limit(limit)
+        )
+        messages = list(reversed(result.scalars().all()))
+    persisted = {message.id for message in messages}
+    messages += [
+        Message(id=entry["id"], role=entry["role"], content=entry["content"])
+        for entry in pending if entry["id"] not in persisted
+    ]
+    return messages[-limit:]
+
+history_manager = HistoryManager(
+    gemini_service.summarize,
+    load_recent_fn=_load_recent_messages,
+    token_budget=settings.HISTORY_TOKEN_BUDGET,
+    max_messages=settings.MAX_HISTORY_LENGTH,
+    max_conversations=settings.HISTORY_MAX_CONVERSATIONS,
+    summary_ttl=settings.HISTORY_SUMMARY_TTL
+)
 
-# Store conversations in memory (replace with database in production)
+# In-memory conversation metadata; recent turns live in the history manager
+# and the journal persists every message
 conversations: Dict[str, Conversation] = {}
+turn_workers: Set[asyncio.Task] = set()
+
+manager = ConnectionManager(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    batch_size=settings.WS_SEND_BATCH_SIZE,
+    max_unpublished=settings.WS_MAX_UNPUBLISHED,
+    remote_check_interval=settings.WS_REMOTE_CHECK_INTERVAL
+)
+
+@app.on_event("startup")
+async def startup():
+    rag_service.start_index_watcher()
+    cache_service.start_invalidation_listener()
+    message_journal.start()
+    manager.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if rag_service.persistence is not None:
+        await rag_service.persistence.flush()
+    await rag_service.embedder.close()
+    await manager.close()
+    await message_journal.close()
+    auth_service.close()
+    await cache_service.close()
+    await async_engine.dispose()
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+async def _timed(stage: str, timings: Dict[str, float], awaitable: Awaitable):
+    """Await a pipeline stage and record its duration in milliseconds"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = _elapsed_ms(start)
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+async def _load_history(conversation_id: str) -> Tuple[str, List[Message]]:
+    """Snapshot the rolling summary and recent turns for prompt assembly"""
+    return await history_manager.window(conversation_id)
 
-    async def connect(self, websocket: WebSocket, user_id: str):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
+async def _load_tools() -> List[Dict]:
+    return tool_service.get_available_tools()
 
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+async def _run_turn(connection: ClientConnection, user, conversation_id: str, content: str):
+    """Answer one user message, streaming delta frames and a final frame.
 
-    async def send_personal_message(self, message: str, user_id: str):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_text(message)
+    The turn may be cancelled at any point; whatever was generated by then
+    is still recorded and sent as the final message, marked cancelled.
+    """
+    user_message = Message(
+        role="user",
+        content=content
+    )
+    
+    # Add message to conversation history
+    await history_manager.append(conversation_id, user_message)
+    user_message.id = await message_journal.append(
+        conversation_id, user.id, "user", user_message.content
+    )
+    
+    timings: Dict[str, float] = {}
+    turn_start = time.perf_counter()
+    context = None
+    cached = None
+    chunks = []
+    cancelled = False
+    generation_start = None
+    try:
+        # Run independent per-turn stages concurrently
+        (summary, history), context, tools = await asyncio.gather(
+            _timed("history", timings, _load_history(conversation_id)),
+            _timed("retrieval", timings, rag_service.get_relevant_context(user_message.content)),
+            _timed("tools", timings, _load_tools())
+        )
+        
+        # Check the semantic cache using the query embedding
+        if settings.RESPONSE_CACHE_ENABLED:
+            query_embedding = await _timed(
+                "cache_lookup",
+                timings,
+                rag_service.embedder.embed(user_message.content)
+            )
+            # Everything before the current message; follow-ups only match in the same thread
+            prior_turns = [message for message in history if message is not user_message]
+            cached = response_cache.lookup(
+                query_embedding, context, user.id, prior_turns, summary
+            )
+
+        generation_start = time.perf_counter()
+        if cached:
+            chunks.append(cached["response"])
+            await manager.send_to_conversation(conversation_id, {
+                "type": "delta",
+                "content": cached["response"],
+                "conversation_id": conversation_id
+            })
+        else:
+            # Stream response chunks from Gemini as delta frames; closing the
+            # stream on cancellation drops the upstream request right away
+            stream = gemini_service.generate_response_stream(
+                messages=history,
+                context=context,
+                tools=tools,
+                summary=summary
+            )
+            async with aclosing(stream):
+                async for delta in stream:
+                    if not chunks:
+                        timings["first_token"] = _elapsed_ms(generation_start)
+                    chunks.append(delta)
+                    await manager.send_to_conversation(conversation_id, {
+                        "type": "delta",
+                        "content": delta,
+                        "conversation_id": conversation_id
+                    })
+            if settings.RESPONSE_CACHE_ENABLED and chunks:
+                response_cache.store(
+                    query_embedding, context, "".join(chunks), user.id, prior_turns, summary
+                )
+    except asyncio.CancelledError:
+        cancelled = True
+        manager.gauges.cancelled_turns += 1
+        if not chunks:
+            await manager.send_to_conversation(conversation_id, {
+                "type": "cancelled",
+                "conversation_id": conversation_id
+            })
+            raise
 
-manager = ConnectionManager()
+    if generation_start is not None:
+        timings["generation"] = _elapsed_ms(generation_start)
+    timings["total"] = _elapsed_ms(turn_start)
+
+    metadata = {"timings": timings}
+    if cancelled:
+        metadata["cancelled"] = True
+    if settings.RESPONSE_CACHE_ENABLED:
+        metadata["cache"] = {"hit": cached is not None}
+        if cached:
+            metadata["cache"]["similarity"] = round(cached["similarity"], 4)
+
+    # Create assistant message
+    assistant_message = Message(
+        role="assistant",
+        content="".join(chunks),
+        context=context,
+        metadata=metadata
+    )
+
+    # Add assistant message to conversation history
+    await history_manager.append(conversation_id, assistant_message)
+    assistant_message.id = await message_journal.append(
+        conversation_id, user.id, "assistant", assistant_message.content, metadata
+    )
+
+    # Send final frame carrying the full (or partial) message
+    await manager.send_to_conversation(conversation_id, {
+        "type": "final",
+        "message": assistant_message.dict(),
+        "conversation_id": conversation_id
+    })
+    if cancelled:
+        raise asyncio.CancelledError()
+
+async def _turn_worker(
+    connection: ClientConnection,
+    user,
+    conversation_id: str,
+    turns: "asyncio.Queue[Optional[str]]"
+):
+    """Run a connection's turns one at a time, in arrival order.
+
+    Each turn is its own task, exposed as `connection.current_turn`, so the
+    receive loop can cancel it without stopping the worker.
+    """
+    while True:
+        content = await turns.get()
+        if content is None:
+            return
+        manager.gauges.queued_turns -= 1
+        manager.gauges.inflight_turns += 1
+        turn = asyncio.create_task(_run_turn(connection, user, conversation_id, content))
+        connection.current_turn = turn
+        try:
+            # wait() rather than await, so a cancelled turn does not cancel the worker
+            await asyncio.wait([turn])
+            if not turn.cancelled() and turn.exception() is not None:
+                print(f"Error running chat turn: {turn.exception()}")
+                connection.send(json.dumps({
+                    "type": "error",
+                    "code": "turn_failed",
+                    "conversation_id": conversation_id
+                }))
+        finally:
+            connection.current_turn = None
+            manager.gauges.inflight_turns -= 1
+            connection.pending_turns -= 1
+
+def _stop_turns(connection: ClientConnection, turns: "asyncio.Queue[Optional[str]]"):
+    """Drop queued turns and cancel the one in flight"""
+    while not turns.empty():
+        if turns.get_nowait() is not None:
+            manager.gauges.queued_turns -= 1
+            connection.pending_turns -= 1
+    if connection.current_turn is not None:
+        connection.current_turn.cancel()
+
+async def _heartbeat(connection: ClientConnection):
+    """Ping the client so live connections keep replying and dead ones get reaped"""
+    while not connection.closed:
+        await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+        connection.send(json.dumps({"type": "ping", "ts": time.time()}))
 
 @app.websocket("/ws/chat/{conversation_id}")
 async def websocket_endpoint(websocket: WebSocket, conversation_id: str):
     await websocket.accept()
     
+    if manager.gauges.open_sockets >= settings.WS_MAX_CONNECTIONS:
+        # Refuse gracefully so clients back off instead of retrying blindly
+        manager.gauges.refused_connections += 1
+        await websocket.send_json({
+            "type": "error",
+            "code": "server_busy",
+            "detail": "Too many connections, please retry shortly"
+        })
+        await websocket.close(code=1013)
+        return
+    manager.gauges.open_sockets += 1
+    
     if conversation_id not in conversations:
         conversations[conversation_id] = Conversation(
             id=conversation_id,
@@ -61,7 +325,9 @@ async def websocket_endpoint(websocket: WebSocket, conversation_id: str):
     
     try:
         # Wait for authentication message
-        auth_message = await websocket.receive_json()
+        auth_message = await asyncio.wait_for(
+            websocket.receive_json(), timeout=settings.WS_IDLE_TIMEOUT
+        )
         if auth_message.get("type") != "authenticate":
             await websocket.close(code=4001)
             return
@@ -69,69 +335,117 @@ async def websocket_endpoint(websocket: WebSocket, conversation_id: str):
         # Verify token
         token = auth_message.get("token")
         try:
-            user = await auth_service.get_current_user(token)
+            async with AsyncSessionLocal() as db:
+                user = await auth_service.get_current_user(token, db)
+                await conversation_service.ensure_conversation(db, conversation_id, user.id)
         except Exception:
             await websocket.close(code=4001)
             return
 
-        await manager.connect(websocket, user.id)
+        connection = await manager.connect(websocket, user.id, conversation_id)
+        turns: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        worker = asyncio.create_task(_turn_worker(connection, user, conversation_id, turns))
+        # Keep a reference until the cancelled turn has recorded its partial output
+        turn_workers.add(worker)
+        worker.add_done_callback(turn_workers.discard)
+        heartbeat = asyncio.create_task(_heartbeat(connection))
         
         try:
             while True:
-                # Receive message from client
-                data = await websocket.receive_text()
-                message_data = json.loads(data)
+                # Any frame, including a pong, counts as activity
+                try:
+                    data = await asyncio.wait_for(
+                        websocket.receive_text(), timeout=settings.WS_IDLE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    manager.gauges.reaped_idle += 1
+                    break
+                try:
+                    message_data = json.loads(data)
+                except json.JSONDecodeError:
+                    message_data = None
+                frame_type = message_data.get("type") if isinstance(message_data, dict) else None
+                if frame_type == "pong":
+                    continue
+                if frame_type == "stop":
+                    _stop_turns(connection, turns)
+                    continue
+                # Anything else must be a chat turn; a bad frame is answered, not fatal
+                if (
+                    not isinstance(message_data, dict)
+                    or frame_type not in (None, "message")
+                    or not isinstance(message_data.get("content"), str)
+                ):
+                    connection.send(json.dumps({
+                        "type": "error",
+                        "code": "bad_frame",
+                        "detail": "Expected a JSON object with a string 'content'",
+                        "conversation_id": conversation_id
+                    }))
+                    continue
+                interrupt = bool(message_data.get("interrupt"))
+                if interrupt:
+                    # A correction replaces whatever is still being answered
+                    _stop_turns(connection, turns)
                 
-                # Create user message
-                user_message = Message(
-                    role="user",
-                    content=message_data["content"]
-                )
-                
-                # Add message to conversation history
-                conversations[conversation_id].messages.append(user_message)
-                
-                # Get relevant context using RAG
-                context = await rag_service.get_relevant_context(user_message.content)
-                
-                # Get available tools
-                tools = tool_service.get_available_tools()
-                
-                # Generate response using Gemini
-                response_content = await gemini_service.generate_response(
-                    messages=conversations[conversation_id].messages,
-                    context=context,
-                    tools=tools
-                )
-                
-                # Create assistant message
-                assistant_message = Message(
-                    role="assistant",
-                    content=response_content,
-                    context=context
-                )
-                
-                # Add assistant message to conversation history
-                conversations[conversation_id].messages.append(assistant_message)
-                
-                # Send response back to client
-                await websocket.send_json({
-                    "message": assistant_message.dict(),
-                    "conversation_id": conversation_id
-                })
+                # One turn runs at a time; a few more may wait, the rest are rejected
+                if not interrupt and connection.pending_turns > settings.WS_MAX_QUEUED_TURNS:
+                    manager.gauges.rejected_turns += 1
+                    connection.send(json.dumps({
+                        "type": "error",
+                        "code": "busy",
+                        "detail": "A response is already in progress",
+                        "conversation_id": conversation_id
+                    }))
+                    continue
+                connection.pending_turns += 1
+                manager.gauges.queued_turns += 1
+                turns.put_nowait(message_data["content"])
                 
         except WebSocketDisconnect:
-            manager.disconnect(user.id)
+            pass
+        except Exception as e:
+            print(f"WebSocket error: {e}")
+            # Close here: disconnect() below would otherwise close with 1000
+            await connection.close(code=4000)
+        finally:
+            heartbeat.cancel()
+            # Nobody is left to read the answer, so stop spending on it
+            _stop_turns(connection, turns)
+            turns.put_nowait(None)
+            await manager.disconnect(connection)
+    except asyncio.TimeoutError:
+        manager.gauges.reaped_idle += 1
+        await websocket.close(code=1001)
     except Exception as e:
         print(f"WebSocket error: {e}")
         await websocket.close(code=4000)
+    finally:
+        manager.gauges.open_sockets -= 1
+
+@app.get("/metrics/websocket")
+async def websocket_metrics():
+    """Capacity gauges for this worker's chat sockets"""
+    return manager.stats()
+
+@app.get("/metrics/embeddings")
+async def embedding_metrics():
+    """Hit, miss and eviction counts of this worker's query-embedding cache"""
+    cache = rag_service.embedder.cache
+    return cache.stats() if cache is not None else {}
 
 # Add REST endpoints for conversation management
 @app.get("/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
     if conversation_id not in conversations:
         return {"error": "Conversation not found"}
-    return conversations[conversation_id]
+    summary, messages = await history_manager.window(conversation_id)
+    return {
+        "id": conversation_id,
+        "metadata": conversations[conversation_id].metadata,
+        "summary": summary,
+        "messages": messages
+    }
 
 @app.post("/conversations")
 async def create_conversation():
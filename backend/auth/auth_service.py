@@ -1,74 +1,251 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import time
+import uuid
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import EmailStr
-from ..database.db import get_db
+from ..config import settings
+from ..database.db import async_redis_client, get_async_db
 from ..database.models import DBUser
-from ..schemas.auth import UserCreate, UserResponse, Token, TokenData
+from ..schemas.auth import UserCreate, UserResponse, TokenData
+from ..services.local_cache import LocalCache
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 class AuthService:
     def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        self.oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+        # Pinning min/max rounds to the default makes any other cost "needs update"
+        self.pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+            bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+            bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+        )
+        # bcrypt is CPU-bound, so it runs off the event loop on a small dedicated pool
+        self._password_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash"
+        )
+        self._password_jobs = 0
+        self.oauth2_scheme = oauth2_scheme
         self.SECRET_KEY = "your-secret-key-stored-in-env"  # Move to environment variables
         self.ALGORITHM = "HS256"
         self.ACCESS_TOKEN_EXPIRE_MINUTES = 30
         self.REFRESH_TOKEN_EXPIRE_DAYS = 7
+        # Verified tokens, keyed by token hash, each expiring no later than the token
+        self.token_cache = LocalCache(
+            settings.AUTH_TOKEN_CACHE_SIZE,
+            ttl=self.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        )
+
+    async def _run_password_job(self, fn: Callable, *args) -> Any:
+        """Run a bcrypt call on the password pool, shedding load when it is backed up"""
+        if self._password_jobs >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._password_jobs += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._password_executor, fn, *args)
+        finally:
+            self._password_jobs -= 1
+
+    async def verify_password(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify a password; also return a fresh hash if the stored one is outdated"""
+        return await self._run_password_job(
+            self.pwd_context.verify_and_update, plain_password, hashed_password
+        )
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return self.pwd_context.verify(plain_password, hashed_password)
+    async def get_password_hash(self, password: str) -> str:
+        return await self._run_password_job(self.pwd_context.hash, password)
 
-    def get_password_hash(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+    def close(self):
+        self._password_executor.shutdown(wait=False)
 
     def create_access_token(self, data: dict) -> str:
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(minutes=self.ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire})
+        now = datetime.utcnow()
+        expire = now + timedelta(minutes=self.ACCESS_TOKEN_EXPIRE_MINUTES)
+        to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex})
         return jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
 
     def create_refresh_token(self, data: dict) -> str:
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=self.REFRESH_TOKEN_EXPIRE_DAYS)
-        to_encode.update({"exp": expire})
+        now = datetime.utcnow()
+        expire = now + timedelta(days=self.REFRESH_TOKEN_EXPIRE_DAYS)
+        to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex})
         return jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
 
+    @staticmethod
+    def principal_claims(user: DBUser) -> dict:
+        """Signed claims that let stateless mode rebuild the principal without the DB"""
+        return {
+            "sub": user.id,
+            "email": user.email,
+            "username": user.username,
+            "full_name": user.full_name,
+            "disabled": bool(user.disabled)
+        }
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _user_revocation_key(user_id: str) -> str:
+        return f"auth:revoked:user:{user_id}"
+
+    @staticmethod
+    def _token_revocation_key(jti: str) -> str:
+        return f"auth:revoked:token:{jti}"
+
     async def get_current_user(
-        self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-    ) -> DBUser:
+        self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+    ) -> UserResponse:
+        """Resolve the bearer token to a user principal.
+
+        Verified tokens are cached by hash until they expire (DB-backed
+        principals for at most AUTH_TOKEN_CACHE_TTL seconds). With
+        AUTH_STATELESS the principal comes from the signed claims alone;
+        either way the Redis revocation list is checked on every call.
+        """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+        token_key = self._token_key(token)
+        cached: Optional[Tuple[UserResponse, Dict]] = self.token_cache.get(token_key)
+        if cached is not None:
+            user, payload = cached
+        else:
+            try:
+                payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+                user_id: str = payload.get("sub")
+                if user_id is None:
+                    raise credentials_exception
+                token_data = TokenData(user_id=user_id)
+            except JWTError:
+                raise credentials_exception
+
+            if settings.AUTH_STATELESS and "email" in payload:
+                user = UserResponse(
+                    id=token_data.user_id,
+                    email=payload["email"],
+                    username=payload["username"],
+                    full_name=payload.get("full_name"),
+                    disabled=payload.get("disabled", False)
+                )
+                ttl = payload["exp"] - time.time()
+            else:
+                result = await db.execute(select(DBUser).where(DBUser.id == token_data.user_id))
+                db_user = result.scalar_one_or_none()
+                if db_user is None:
+                    raise credentials_exception
+                user = UserResponse.from_orm(db_user)
+                ttl = min(payload["exp"] - time.time(), settings.AUTH_TOKEN_CACHE_TTL)
+            if ttl > 0:
+                self.token_cache.set(token_key, (user, payload), ttl)
+
+        if user.disabled or await self._is_revoked(payload):
+            self.token_cache.delete(token_key)
+            raise credentials_exception
+        return user
+
+    async def _is_revoked(self, payload: Dict) -> bool:
+        """Check the Redis revocation list for the user and for this token"""
+        if not settings.AUTH_REVOCATION_CHECK:
+            return False
+        keys = [self._user_revocation_key(payload["sub"])]
+        if payload.get("jti"):
+            keys.append(self._token_revocation_key(payload["jti"]))
+        try:
+            revoked_user_at, revoked_token = (await async_redis_client.mget(keys) + [None])[:2]
+        except Exception as e:
+            print(f"Error checking token revocation: {e}")
+            # Without a DB lookup the revocation list is the only cut-off, so fail closed
+            return settings.AUTH_STATELESS
+        if revoked_token is not None:
+            return True
+        # Both sides are whole seconds, so a token issued in the revocation second is revoked too
+        return revoked_user_at is not None and int(payload.get("iat", 0)) <= int(revoked_user_at)
+
+    async def revoke_user(self, user_id: str):
+        """Invalidate every token issued to a user so far, e.g. on a password change"""
+        await async_redis_client.setex(
+            self._user_revocation_key(user_id),
+            timedelta(days=self.REFRESH_TOKEN_EXPIRE_DAYS),
+            str(int(time.time()))
+        )
+
+    async def revoke_token(self, token: str):
+        """Invalidate a single token, e.g. on logout"""
         try:
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            user_id: str = payload.get("sub")
-            if user_id is None:
-                raise credentials_exception
-            token_data = TokenData(user_id=user_id)
         except JWTError:
-            raise credentials_exception
+            return
+        ttl = int(payload["exp"] - time.time())
+        if payload.get("jti") and ttl > 0:
+            await async_redis_client.setex(self._token_revocation_key(payload["jti"]), ttl, "1")
+        self.token_cache.delete(self._token_key(token))
 
-        user = db.query(DBUser).filter(DBUser.id == token_data.user_id).first()
+    async def verify_refresh_token(self, token: str) -> Dict:
+        """Decode a refresh token, rejecting it once it or its user is revoked"""
+        try:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except JWTError:
+            payload = {}
+        if payload.get("sub") is None or await self._is_revoked(payload):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token"
+            )
+        return payload
+
+    async def change_password(
+        self, user_id: str, current_password: str, new_password: str, db: AsyncSession
+    ):
+        """Replace a user's password and revoke every token issued before the change"""
+        result = await db.execute(select(DBUser).where(DBUser.id == user_id))
+        user = result.scalar_one_or_none()
         if user is None:
-            raise credentials_exception
-        return user
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        verified, _ = await self.verify_password(current_password, user.hashed_password)
+        if not verified:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Incorrect password"
+            )
+        user.hashed_password = await self.get_password_hash(new_password)
+        await db.commit()
+        # Cached principals are re-checked against the revocation list on every call
+        await self.revoke_user(user_id)
 
-    async def register_user(self, user_data: UserCreate, db: Session) -> UserResponse:
+    async def register_user(self, user_data: UserCreate, db: AsyncSession) -> UserResponse:
         # Check if user exists
-        if db.query(DBUser).filter(DBUser.email == user_data.email).first():
+        result = await db.execute(select(DBUser).where(DBUser.email == user_data.email))
+        if result.scalar_one_or_none():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
 
         # Create new user
-        hashed_password = self.get_password_hash(user_data.password)
+        hashed_password = await self.get_password_hash(user_data.password)
         db_user = DBUser(
             email=user_data.email,
             username=user_data.username,
@@ -77,17 +254,25 @@ class AuthService:
         )
         
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         
         return UserResponse.from_orm(db_user)
 
     async def authenticate_user(
-        self, email: EmailStr, password: str, db: Session
+        self, email: EmailStr, password: str, db: AsyncSession
     ) -> Optional[DBUser]:
-        user = db.query(DBUser).filter(DBUser.email == email).first()
-        if not user or not self.verify_password(password, user.hashed_password):
+        result = await db.execute(select(DBUser).where(DBUser.email == email))
+        user = result.scalar_one_or_none()
+        if not user:
+            return None
+        verified, new_hash = await self.verify_password(password, user.hashed_password)
+        if not verified:
             return None
+        if new_hash:
+            # Cost parameters changed since this hash was made; upgrade it transparently
+            user.hashed_password = new_hash
+            await db.commit()
         return user
 
 auth_service = AuthService()
\ No newline at end of file
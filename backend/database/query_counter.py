@@ -0,0 +1,53 @@
+# backend/database/query_counter.py
+
+from contextlib import contextmanager
+from typing import Iterator, List
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+class QueryCounter:
+    """Statements executed on an engine while the counter is active"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries(engine=None) -> Iterator[QueryCounter]:
+    """Count SQL statements issued on `engine` (sync or async) inside the block"""
+    if engine is None:
+        from .db import async_engine
+        engine = async_engine
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._record)
+
+@contextmanager
+def assert_max_queries(limit: int, engine=None) -> Iterator[QueryCounter]:
+    """Fail when the block issues more than `limit` statements.
+
+    Wrap a service call to pin its query budget, e.g. a conversation listing
+    must stay constant no matter how many rows it returns:
+
+        with assert_max_queries(3):
+            await conversation_service.get_conversations(db, user_id, limit=50)
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        executed = "\n".join(f"  {statement}" for statement in counter.statements)
+        raise AssertionError(
+            f"Expected at most {limit} queries, {counter.count} were executed:\n{executed}"
+        )
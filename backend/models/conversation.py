@@ -1,9 +1,13 @@
-from sqlalchemy import Column, String, DateTime, JSON, ForeignKey, Table, Integer
+from sqlalchemy import Boolean, Column, String, DateTime, JSON, ForeignKey, Table, Index, DDL, event, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 from ..database.db import Base
 
+# Full-text search expressions; queries must repeat them verbatim to hit the GIN indexes
+CONVERSATION_TSVECTOR = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+MESSAGE_TSVECTOR = "to_tsvector('english', content)"
+
 # Many-to-many relationship for conversation tags
 conversation_tags = Table(
     'conversation_tags',
@@ -45,14 +49,32 @@ class Conversation(Base):
     title = Column(String, nullable=False)
     description = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     metadata = Column(JSON, default=dict)
-    is_pinned = Column(Boolean, default=False)
+    is_pinned = Column(Boolean, nullable=False, default=False)
     
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
-    folder = relationship("Folder", back_populates="conversations")
-    tags = relationship("Tag", secondary=conversation_tags, back_populates="conversations")
+    # Loading is chosen per query in ConversationService; an unplanned lazy load raises
+    messages = relationship(
+        "Message", back_populates="conversation", cascade="all, delete-orphan", lazy="raise_on_sql"
+    )
+    folder = relationship("Folder", back_populates="conversations", lazy="raise_on_sql")
+    tags = relationship(
+        "Tag", secondary=conversation_tags, back_populates="conversations", lazy="raise_on_sql"
+    )
     user = relationship("DBUser", back_populates="conversations")
+    
+    __table_args__ = (
+        # Serves keyset pagination of a user's list in (is_pinned, updated_at, id) order
+        Index(
+            "ix_conversations_user_pinned_updated",
+            "user_id", "is_pinned", "updated_at", "id"
+        ),
+        Index(
+            "ix_conversations_fts",
+            text(CONVERSATION_TSVECTOR),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
@@ -64,4 +86,52 @@ class Message(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     metadata = Column(JSON, default=dict)
     
-    conversation = relationship("Conversation", back_populates="messages")
\ No newline at end of file
+    conversation = relationship("Conversation", back_populates="messages")
+    
+    __table_args__ = (
+        Index(
+            "ix_messages_fts",
+            text(MESSAGE_TSVECTOR),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+# SQLite has no tsvector; local databases keep FTS5 shadow tables instead
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5("
+        "conversation_id UNINDEXED, user_id UNINDEXED, title, description)"
+    ).execute_if(dialect="sqlite")
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+        "message_id UNINDEXED, conversation_id UNINDEXED, user_id UNINDEXED, content)"
+    ).execute_if(dialect="sqlite")
+)
+
+# Backfill rows written before the FTS5 tables existed; only while a table is
+# still empty, so later create_all runs stay cheap and never duplicate rows
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "INSERT INTO conversations_fts (conversation_id, user_id, title, description) "
+        "SELECT id, user_id, coalesce(title, ''), coalesce(description, '') FROM conversations "
+        "WHERE NOT EXISTS (SELECT 1 FROM conversations_fts)"
+    ).execute_if(dialect="sqlite")
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "INSERT INTO messages_fts (message_id, conversation_id, user_id, content) "
+        "SELECT m.id, m.conversation_id, c.user_id, m.content "
+        "FROM messages m JOIN conversations c ON c.id = m.conversation_id "
+        "WHERE NOT EXISTS (SELECT 1 FROM messages_fts)"
+    ).execute_if(dialect="sqlite")
+)
\ No newline at end of file
@@ -1,20 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from ..database.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from ..database.db import get_async_db
 from ..auth.auth_service import auth_service
-from ..schemas.auth import UserCreate, UserResponse, Token, TokenData
+from ..schemas.auth import PasswordChange, UserCreate, UserResponse, Token, TokenData
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     return await auth_service.register_user(user_data, db)
 
 @router.post("/token", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user = await auth_service.authenticate_user(form_data.username, form_data.password, db)
     if not user:
@@ -24,7 +25,7 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = auth_service.create_access_token(data={"sub": user.id})
+    access_token = auth_service.create_access_token(data=auth_service.principal_claims(user))
     refresh_token = auth_service.create_refresh_token(data={"sub": user.id})
     
     return {
@@ -36,30 +37,37 @@ async def login(
 @router.post("/refresh", response_model=Token)
 async def refresh_token(
     refresh_token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        payload = jwt.decode(
-            refresh_token, 
-            auth_service.SECRET_KEY, 
-            algorithms=[auth_service.ALGORITHM]
-        )
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid refresh token"
-            )
-        
-        # Create new access token
-        access_token = auth_service.create_access_token(data={"sub": user_id})
-        return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "token_type": "bearer"
-        }
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token"
-        )
\ No newline at end of file
+    # Revoked refresh tokens must not mint new access tokens
+    payload = await auth_service.verify_refresh_token(refresh_token)
+    
+    # Create new access token
+    access_token = auth_service.create_access_token(data={"sub": payload["sub"]})
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+@router.post("/logout")
+async def logout(
+    refresh_token: Optional[str] = None,
+    token: str = Depends(auth_service.oauth2_scheme),
+    current_user = Depends(auth_service.get_current_user)
+):
+    await auth_service.revoke_token(token)
+    if refresh_token:
+        await auth_service.revoke_token(refresh_token)
+    return {"message": "Logged out"}
+
+@router.post("/password")
+async def change_password(
+    data: PasswordChange,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(auth_service.get_current_user)
+):
+    await auth_service.change_password(
+        current_user.id, data.current_password, data.new_password, db
+    )
+    return {"message": "Password changed, please sign in again"}
\ No newline at end of file
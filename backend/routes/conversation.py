@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from ..database.db import get_db
+from ..database.db import get_async_db
 from ..services.conversation_service import conversation_service
 from ..auth.auth_service import auth_service
 from ..schemas.conversation import (
@@ -21,31 +21,49 @@ router = APIRouter(prefix="/conversations", tags=["conversations"])
 @router.post("/", response_model=ConversationResponse)
 async def create_conversation(
     data: ConversationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(auth_service.get_current_user)
 ):
     return await conversation_service.create_conversation(db, current_user.id, data)
 
 @router.get("/", response_model=List[ConversationResponse])
 async def get_conversations(
+    response: Response,
     folder_id: Optional[str] = None,
     search: Optional[str] = None,
     tags: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(auth_service.get_current_user)
 ):
     tag_ids = tags.split(",") if tags else None
-    return await conversation_service.get_conversations(
-        db, current_user.id, folder_id, search, tag_ids, skip, limit
+    conversations, next_cursor = await conversation_service.get_conversations_page(
+        db, current_user.id, folder_id, search, tag_ids, skip, limit, cursor
     )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return conversations
+
+@router.get("/search")
+async def search_conversations(
+    q: str,
+    include_messages: bool = False,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(auth_service.get_current_user)
+):
+    results = await conversation_service.search_conversations(
+        db, current_user.id, q, include_messages, limit
+    )
+    return {"results": results}
 
 @router.post("/{conversation_id}/messages", response_model=MessageResponse)
 async def add_message(
     conversation_id: str,
     message: MessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(auth_service.get_current_user)
 ):
     return await conversation_service.add_message(
@@ -55,7 +73,7 @@ async def add_message(
 @router.post("/folders", response_model=FolderResponse)
 async def create_folder(
     data: FolderCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(auth_service.get_current_user)
 ):
     return await conversation_service.create_folder(
@@ -65,7 +83,7 @@ async def create_folder(
 @router.post("/tags", response_model=TagResponse)
 async def create_tag(
     data: TagCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(auth_service.get_current_user)
 ):
     return await conversation_service.create_tag(
@@ -76,7 +94,7 @@ async def create_tag(
 async def update_conversation(
     conversation_id: str,
     data: ConversationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(auth_service.get_current_user)
 ):
     return await conversation_service.update_conversation(
@@ -86,7 +104,7 @@ async def update_conversation(
 @router.delete("/{conversation_id}")
 async def delete_conversation(
     conversation_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(auth_service.get_current_user)
 ):
     await conversation_service.delete_conversation(db, conversation_id, current_user.id)
@@ -22,4 +22,8 @@ class Token(BaseModel):
     token_type: str
 
 class TokenData(BaseModel):
-    user_id: Optional[str] = None
\ No newline at end of file
+    user_id: Optional[str] = None
+
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
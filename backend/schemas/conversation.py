@@ -0,0 +1,66 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+class FolderCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+
+class FolderResponse(FolderCreate):
+    id: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class TagCreate(BaseModel):
+    name: str
+    color: Optional[str] = None
+
+class TagResponse(TagCreate):
+    id: str
+
+    class Config:
+        from_attributes = True
+
+class MessageCreate(BaseModel):
+    role: str
+    content: str
+    metadata: Dict[str, Any] = {}
+
+class MessageResponse(MessageCreate):
+    id: str
+    conversation_id: str
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ConversationCreate(BaseModel):
+    title: str
+    description: Optional[str] = None
+    folder_id: Optional[str] = None
+    tags: Optional[List[str]] = None
+
+class ConversationUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    folder_id: Optional[str] = None
+    tags: Optional[List[str]] = None
+    is_pinned: Optional[bool] = None
+
+class ConversationResponse(BaseModel):
+    id: str
+    title: str
+    description: Optional[str] = None
+    folder_id: Optional[str] = None
+    is_pinned: bool = False
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    # List views never load messages, so the history is not part of the response
+    tags: List[TagResponse] = []
+    folder: Optional[FolderResponse] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,188 @@
+# backend/services/cache_codec.py
+
+from typing import Any, Callable, Dict, List, Tuple
+import json
+import random
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Encoded values start with a marker byte >= 0x80, which can never begin a
+# legacy plain-JSON value: bit 7 flags the framed format, bits 4-6 hold the
+# compression id and bits 0-3 the codec id.
+MARKER_FLAG = 0x80
+
+CODEC_IDS = {"json": 0, "orjson": 1, "msgpack": 2}
+COMPRESSION_IDS = {"none": 0, "zstd": 1, "lz4": 2}
+
+def _serializers(codec: str) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    if codec == "json":
+        return (lambda value: json.dumps(value).encode("utf-8")), json.loads
+    if codec == "orjson":
+        if orjson is None:
+            raise ValueError("CACHE_CODEC 'orjson' requires the orjson package")
+        return orjson.dumps, orjson.loads
+    if codec == "msgpack":
+        if msgpack is None:
+            raise ValueError("CACHE_CODEC 'msgpack' requires the msgpack package")
+        return (
+            lambda value: msgpack.packb(value, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False)
+        )
+    raise ValueError(f"Unknown cache codec {codec}")
+
+def _compressors(compression: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    if compression == "none":
+        return (lambda data: data), (lambda data: data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("CACHE_COMPRESSION 'zstd' requires the zstandard package")
+        return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+    if compression == "lz4":
+        if lz4_frame is None:
+            raise ValueError("CACHE_COMPRESSION 'lz4' requires the lz4 package")
+        return lz4_frame.compress, lz4_frame.decompress
+    raise ValueError(f"Unknown cache compression {compression}")
+
+class CacheCodec:
+    """Serializes cache values with a one-byte marker naming codec and compression.
+
+    Values without a marker are legacy JSON strings and are still readable,
+    so old and new entries can coexist in Redis during a rollout.
+    """
+
+    def __init__(
+        self,
+        codec: str = "json",
+        compression: str = "none",
+        compression_threshold: int = 1024
+    ):
+        self.codec_id = CODEC_IDS[codec]
+        self.compression_id = COMPRESSION_IDS[compression]
+        self.compression_threshold = compression_threshold
+        self._dumps, _ = _serializers(codec)
+        self._compress, _ = _compressors(compression)
+        self._loaders: Dict[int, Callable[[bytes], Any]] = {}
+        self._decompressors: Dict[int, Callable[[bytes], bytes]] = {}
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._dumps(value)
+        compression_id = 0
+        if self.compression_id and len(payload) >= self.compression_threshold:
+            payload = self._compress(payload)
+            compression_id = self.compression_id
+        return bytes([MARKER_FLAG | compression_id << 4 | self.codec_id]) + payload
+
+    def decode(self, data: bytes) -> Any:
+        if not data[0] & MARKER_FLAG:
+            return json.loads(data)
+
+        codec_id = data[0] & 0x0F
+        compression_id = (data[0] >> 4) & 0x07
+        payload = data[1:]
+        if compression_id:
+            payload = self._decompressor(compression_id)(payload)
+        return self._loader(codec_id)(payload)
+
+    def _loader(self, codec_id: int) -> Callable[[bytes], Any]:
+        if codec_id not in self._loaders:
+            name = next(name for name, id_ in CODEC_IDS.items() if id_ == codec_id)
+            self._loaders[codec_id] = _serializers(name)[1]
+        return self._loaders[codec_id]
+
+    def _decompressor(self, compression_id: int) -> Callable[[bytes], bytes]:
+        if compression_id not in self._decompressors:
+            name = next(name for name, id_ in COMPRESSION_IDS.items() if id_ == compression_id)
+            self._decompressors[compression_id] = _compressors(name)[1]
+        return self._decompressors[compression_id]
+
+def sample_payloads() -> Dict[str, Any]:
+    """Representative shapes of what the app caches"""
+    rng = random.Random(0)
+    words = ["vector", "index", "gemini", "conversation", "context", "retrieval",
+             "embedding", "latency", "cache", "document", "user", "answer"]
+
+    def text(n: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    return {
+        "retrieved_context": [
+            {
+                "content": text(170),
+                "metadata": {"source": "upload.pdf", "chunk_id": i, "timestamp": "2024-10-27T09:23:57"},
+                "similarity_score": rng.random()
+            }
+            for i in range(3)
+        ],
+        "message_history": [
+            {
+                "id": f"msg-{i}",
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": text(60),
+                "created_at": "2024-10-27T09:23:57"
+            }
+            for i in range(50)
+        ],
+        "embedding": [rng.uniform(-1, 1) for _ in range(768)],
+        "conversation_list": [
+            {"id": f"conv-{i}", "title": text(5), "is_pinned": i < 3, "updated_at": "2024-10-27T09:23:57"}
+            for i in range(50)
+        ]
+    }
+
+def benchmark(rounds: int = 200) -> List[Dict]:
+    rows = []
+    payloads = sample_payloads()
+    for codec in CODEC_IDS:
+        for compression in COMPRESSION_IDS:
+            try:
+                cache_codec = CacheCodec(codec, compression, compression_threshold=0)
+            except ValueError as e:
+                print(f"Skipping {codec}+{compression}: {e}")
+                continue
+            for name, payload in payloads.items():
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    encoded = cache_codec.encode(payload)
+                encode_us = (time.perf_counter() - start) / rounds * 1e6
+
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    cache_codec.decode(encoded)
+                decode_us = (time.perf_counter() - start) / rounds * 1e6
+
+                rows.append({
+                    "payload": name,
+                    "codec": codec,
+                    "compression": compression,
+                    "bytes": len(encoded),
+                    "encode_us": encode_us,
+                    "decode_us": decode_us
+                })
+    return rows
+
+if __name__ == "__main__":
+    print(f"{'payload':<20}{'codec':<10}{'compress':<10}{'bytes':>10}{'enc us':>10}{'dec us':>10}")
+    for row in sorted(benchmark(), key=lambda row: (row["payload"], row["bytes"])):
+        print(
+            f"{row['payload']:<20}{row['codec']:<10}{row['compression']:<10}"
+            f"{row['bytes']:>10}{row['encode_us']:>10.1f}{row['decode_us']:>10.1f}"
+        )
@@ -1,26 +1,294 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
 import json
-from typing import Any, Optional
-from ..database.db import redis_client
+import math
+import random
+import time
+import uuid
+from ..database.db import async_redis_client
 from ..config import settings
+from .cache_codec import CacheCodec
+from .local_cache import LocalCache
+
+codec = CacheCodec(
+    settings.CACHE_CODEC,
+    settings.CACHE_COMPRESSION,
+    settings.CACHE_COMPRESSION_THRESHOLD
+)
+
+# In-process L1 tier; other workers' copies are dropped via Redis pub/sub
+local_cache = LocalCache(settings.CACHE_L1_SIZE, settings.CACHE_L1_TTL)
+INVALIDATION_CHANNEL = "cache:invalidate"
+WORKER_ID = uuid.uuid4().hex
+
+# Deletes the single-flight lock only if this worker still owns it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_inflight: Dict[str, asyncio.Task] = {}
+_listener: Optional[asyncio.Task] = None
 
 class CacheService:
+    """Redis cache with an in-process L1 tier in front of it.
+
+    L1 keeps the encoded bytes and every hit decodes a fresh copy, so a
+    caller mutating its result cannot change what later readers get.
+    """
+
     @staticmethod
     async def get(key: str) -> Optional[Any]:
-        data = redis_client.get(key)
-        return json.loads(data) if data else None
+        data = local_cache.get(key)
+        if data is None:
+            data = await async_redis_client.get(key)
+            if not data:
+                return None
+            local_cache.set(key, data)
+        return codec.decode(data)
 
     @staticmethod
     async def set(key: str, value: Any, ttl: int = settings.CACHE_TTL):
-        redis_client.setex(key, ttl, json.dumps(value))
+        data = codec.encode(value)
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            pipe.setex(key, ttl, data)
+            CacheService._queue_invalidation(pipe, keys=[key])
+            await pipe.execute()
+        local_cache.set(key, data, ttl)
+
+    @staticmethod
+    async def get_bytes(key: str) -> Optional[bytes]:
+        return await async_redis_client.get(key)
+
+    @staticmethod
+    async def set_bytes(key: str, value: bytes, ttl: int = settings.CACHE_TTL):
+        await async_redis_client.setex(key, ttl, value)
+
+    @staticmethod
+    async def get_many(keys: List[str]) -> Dict[str, Any]:
+        """Fetch many keys in one round trip, omitting misses"""
+        encoded = {}
+        for key in keys:
+            data = local_cache.get(key)
+            if data is not None:
+                encoded[key] = data
+        missing = [key for key in keys if key not in encoded]
+        if missing:
+            values = await async_redis_client.mget(missing)
+            for key, data in zip(missing, values):
+                if data:
+                    encoded[key] = data
+                    local_cache.set(key, data)
+        return {key: codec.decode(data) for key, data in encoded.items()}
+
+    @staticmethod
+    async def set_many(mapping: Dict[str, Any], ttl: int = settings.CACHE_TTL):
+        """Store many keys in one pipelined round trip"""
+        if not mapping:
+            return
+        encoded = {key: codec.encode(value) for key, value in mapping.items()}
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for key, data in encoded.items():
+                pipe.setex(key, ttl, data)
+            CacheService._queue_invalidation(pipe, keys=list(encoded))
+            await pipe.execute()
+        for key, data in encoded.items():
+            local_cache.set(key, data, ttl)
 
     @staticmethod
     async def delete(key: str):
-        redis_client.delete(key)
+        await CacheService.delete_many([key])
+
+    @staticmethod
+    async def delete_many(keys: List[str]):
+        if not keys:
+            return
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys)
+            CacheService._queue_invalidation(pipe, keys=keys)
+            await pipe.execute()
+        for key in keys:
+            local_cache.delete(key)
+
+    @staticmethod
+    async def clear_pattern(
+        pattern: str,
+        batch_size: int = settings.CACHE_SCAN_BATCH_SIZE
+    ) -> int:
+        """Incrementally SCAN for matching keys and UNLINK them in bounded batches"""
+        deleted = 0
+        batch = []
+        async for key in async_redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await async_redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await async_redis_client.unlink(*batch)
+        # Only once Redis is clean, or L1 could be refilled from keys not yet unlinked
+        local_cache.clear_pattern(pattern)
+        await CacheService._publish_invalidation(pattern=pattern)
+        return deleted
+
+    @staticmethod
+    async def versioned_key(key: str, tags: List[str]) -> str:
+        """Embed the current version of each tag in the key.
+
+        Bumping a tag's version with `invalidate_tags` makes every key built
+        from the old version unreachable at once; stale entries age out by TTL.
+        """
+        if not tags:
+            return key
+        versions = await async_redis_client.mget([f"tag:{tag}:version" for tag in tags])
+        suffix = ".".join(
+            f"{tag}={int(version or 0)}" for tag, version in zip(tags, versions)
+        )
+        return f"{key}@{suffix}"
+
+    @staticmethod
+    async def invalidate_tags(tags: List[str]):
+        """Invalidate every key built with any of the given tags in O(1) per tag"""
+        if not tags:
+            return
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"tag:{tag}:version")
+            await pipe.execute()
+
+    @staticmethod
+    async def get_or_compute(
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int = settings.CACHE_TTL,
+        beta: float = settings.CACHE_EARLY_REFRESH_BETA
+    ) -> Any:
+        """Return the cached value, computing it at most once across callers.
+
+        Entries are refreshed probabilistically before they expire, weighted
+        by how long they took to compute, so hot keys never all miss at once.
+        Concurrent callers in this worker share one computation and other
+        workers defer to a short-lived Redis lock.
+        """
+        envelope = await CacheService.get(key)
+        if envelope is not None and not CacheService._should_refresh(envelope, beta):
+            return envelope["value"]
+
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(
+                CacheService._refresh(key, compute, ttl, envelope)
+            )
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _should_refresh(envelope: Dict, beta: float) -> bool:
+        # XFetch: refresh early with probability rising as expiry approaches
+        jitter = -envelope["delta"] * beta * math.log(1.0 - random.random())
+        return time.time() + jitter >= envelope["expiry"]
+
+    @staticmethod
+    async def _refresh(
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int,
+        envelope: Optional[Dict]
+    ) -> Any:
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        acquired = await async_redis_client.set(
+            lock_key, token, nx=True, px=settings.CACHE_LOCK_TIMEOUT_MS
+        )
+        if not acquired:
+            # Another worker is recomputing; serve the current value if we have one
+            if envelope is not None:
+                return envelope["value"]
+            deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT_MS / 1000
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                envelope = await CacheService.get(key)
+                if envelope is not None:
+                    return envelope["value"]
+
+        try:
+            start = time.monotonic()
+            value = await compute()
+            await CacheService.set(key, {
+                "value": value,
+                "delta": time.monotonic() - start,
+                "expiry": time.time() + ttl
+            }, ttl)
+            return value
+        finally:
+            if acquired:
+                await async_redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+    @staticmethod
+    def _invalidation_event(
+        keys: Optional[List[str]] = None,
+        pattern: Optional[str] = None
+    ) -> str:
+        return json.dumps({"origin": WORKER_ID, "keys": keys or [], "pattern": pattern})
+
+    @staticmethod
+    def _queue_invalidation(pipe, keys: Optional[List[str]] = None):
+        """Add the invalidation PUBLISH to a pipeline, riding the write's round trip"""
+        if settings.CACHE_L1_SIZE:
+            pipe.publish(INVALIDATION_CHANNEL, CacheService._invalidation_event(keys=keys))
+
+    @staticmethod
+    async def _publish_invalidation(
+        keys: Optional[List[str]] = None,
+        pattern: Optional[str] = None
+    ):
+        if not settings.CACHE_L1_SIZE:
+            return
+        await async_redis_client.publish(
+            INVALIDATION_CHANNEL, CacheService._invalidation_event(keys, pattern)
+        )
+
+    @staticmethod
+    async def _listen_for_invalidations():
+        """Drop L1 entries that other workers have changed"""
+        while True:
+            pubsub = async_redis_client.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were disconnected is unknown
+                local_cache.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if event["origin"] == WORKER_ID:
+                        continue
+                    if event["pattern"]:
+                        local_cache.clear_pattern(event["pattern"])
+                    for key in event["keys"]:
+                        local_cache.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    @staticmethod
+    def start_invalidation_listener():
+        global _listener
+        if settings.CACHE_L1_SIZE and _listener is None:
+            _listener = asyncio.create_task(CacheService._listen_for_invalidations())
 
     @staticmethod
-    async def clear_pattern(pattern: str):
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
+    async def close():
+        global _listener
+        if _listener is not None:
+            _listener.cancel()
+            _listener = None
+        await async_redis_client.close()
 
 cache_service = CacheService()
\ No newline at end of file
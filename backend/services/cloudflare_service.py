@@ -1,20 +1,25 @@
 # backend/services/cloudflare_service.py
 
 from typing import List, Dict, Optional
-import asyncio
 import httpx
 import json
+import uuid
 from datetime import datetime
+import numpy as np
 import boto3
 from botocore.config import Config
 from sentence_transformers import SentenceTransformer
+from .embedding_service import EmbeddingExecutor
+from .embedding_cache import EmbeddingCache
 
 class CloudflareService:
     def __init__(self, config):
         self.config = config
         
         # Initialize embedding model
-        self.embedding_model = SentenceTransformer('all-mpnet-base-v2')
+        self.embedding_model = SentenceTransformer(
+            config.EMBEDDING_MODEL, device=config.EMBEDDING_DEVICE
+        )
         
         # Initialize Vectorize client
         self.vectorize_client = httpx.AsyncClient(
@@ -135,6 +140,18 @@ class RAGService:
         self.cloudflare = CloudflareService(config)
         self.vectorize = VectorizeDB(self.cloudflare)
         self.storage = R2Storage(self.cloudflare)
+        self.embedder = EmbeddingExecutor(
+            self.cloudflare.embedding_model.encode,
+            batch_size=config.EMBEDDING_BATCH_SIZE,
+            max_wait_ms=config.EMBEDDING_BATCH_WAIT_MS,
+            pool_size=config.EMBEDDING_POOL_SIZE,
+            cache=EmbeddingCache(
+                config.EMBEDDING_MODEL,
+                max_entries=config.EMBEDDING_CACHE_SIZE,
+                use_redis=config.EMBEDDING_CACHE_REDIS,
+                ttl=config.EMBEDDING_CACHE_TTL
+            )
+        )
         
         # Text splitting settings
         self.chunk_size = 1000
@@ -163,43 +180,79 @@ class RAGService:
         metadata: Optional[Dict] = None
     ) -> str:
         """Add a document to RAG system"""
+        document_ids = await self.add_documents([
+            {"content": content, "metadata": metadata}
+        ])
+        return document_ids[0]
+
+    async def add_documents(self, documents: List[Dict]) -> List[str]:
+        """Add many documents in one pass, encoding all chunks in sized batches"""
         try:
-            # Generate document ID
-            document_id = f"doc_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+            document_ids = []
+            chunk_records = []
+            
+            for document in documents:
+                content = document["content"]
+                metadata = document.get("metadata") or {}
+                
+                # Generate document ID
+                document_id = (
+                    f"doc_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+                    f"_{uuid.uuid4().hex[:8]}"
+                )
+                document_ids.append(document_id)
+                
+                # Store original document in R2
+                await self.storage.upload_document(content, document_id, metadata)
+                
+                # Split into chunks
+                for i, chunk in enumerate(self._split_text(content)):
+                    chunk_records.append((document_id, i, chunk, metadata))
             
-            # Store original document in R2
-            await self.storage.upload_document(content, document_id, metadata)
+            if not chunk_records:
+                return document_ids
             
-            # Split into chunks and generate embeddings
-            chunks = self._split_text(content)
-            vectors = []
+            # Generate all embeddings as a single array
+            embeddings = await self._encode_chunks(
+                [chunk for _, _, chunk, _ in chunk_records]
+            )
             
-            for i, chunk in enumerate(chunks):
-                # Generate embedding
-                embedding = self.cloudflare.embedding_model.encode(chunk)
-                
-                # Prepare vector record
-                vector = {
+            # Prepare vector records
+            vectors = [
+                {
                     "id": f"{document_id}_chunk_{i}",
                     "values": embedding.tolist(),
                     "metadata": {
                         "document_id": document_id,
                         "chunk_index": i,
                         "content": chunk,
-                        **metadata if metadata else {}
+                        **metadata
                     }
                 }
-                vectors.append(vector)
+                for (document_id, i, chunk, metadata), embedding
+                in zip(chunk_records, embeddings)
+            ]
             
-            # Insert vectors into Vectorize
-            await self.vectorize.insert_vectors(vectors)
+            # Insert vectors into Vectorize in sized batches
+            batch_size = self.config.INGEST_BATCH_SIZE
+            for start in range(0, len(vectors), batch_size):
+                await self.vectorize.insert_vectors(vectors[start:start + batch_size])
             
-            return document_id
+            return document_ids
             
         except Exception as e:
-            print(f"Error adding document: {e}")
+            print(f"Error adding documents: {e}")
             raise
 
+    async def _encode_chunks(self, chunks: List[str]) -> np.ndarray:
+        """Encode chunks in batches of INGEST_BATCH_SIZE on the embedding pool"""
+        batch_size = self.config.INGEST_BATCH_SIZE
+        batches = [
+            await self.embedder.embed_batch(chunks[start:start + batch_size])
+            for start in range(0, len(chunks), batch_size)
+        ]
+        return np.vstack(batches).astype(np.float32)
+
     async def get_relevant_context(
         self, 
         query: str,
@@ -208,7 +261,7 @@ class RAGService:
         """Get relevant context for a query"""
         try:
             # Generate query embedding
-            query_embedding = self.cloudflare.embedding_model.encode(query)
+            query_embedding = await self.embedder.embed(query)
             
             # Query Vectorize
             matches = await self.vectorize.query_vectors(
@@ -0,0 +1,335 @@
+# backend/services/connection_manager.py
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import defaultdict
+import asyncio
+import json
+import time
+import uuid
+from fastapi import WebSocket
+from ..database.db import async_redis_client
+
+WORKER_ID = uuid.uuid4().hex
+
+class ConnectionGauges:
+    """Point-in-time counts and running totals for capacity planning"""
+
+    def __init__(self):
+        self.open_sockets = 0
+        self.queued_turns = 0
+        self.inflight_turns = 0
+        self.rejected_turns = 0
+        self.cancelled_turns = 0
+        self.dropped_publishes = 0
+        self.refused_connections = 0
+        self.reaped_idle = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+class ClientConnection:
+    """One accepted socket with its own bounded outbound queue.
+
+    Frames are queued without waiting and written by a per-socket sender
+    task, so a slow client only ever delays itself. A client that lets its
+    queue fill up is disconnected rather than allowed to buffer unboundedly.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        conversation_id: Optional[str] = None,
+        queue_size: int = 256,
+        batch_size: int = 32
+    ):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.batch_size = batch_size
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.pending_turns = 0
+        self.current_turn: Optional[asyncio.Task] = None
+        self.closed = False
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def send(self, message: str) -> bool:
+        """Queue a text frame; returns False if the connection had to be dropped"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            print(f"Dropping slow WebSocket client {self.id} for user {self.user_id}")
+            asyncio.create_task(self.close(code=1013))
+            return False
+
+    async def _send_loop(self):
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                while len(batch) < self.batch_size and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                for message in batch:
+                    await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"WebSocket send error: {e}")
+            self.closed = True
+
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+        self._sender.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+class ConnectionManager:
+    """Registry of live sockets by user and by conversation, across workers.
+
+    Sockets on this worker are delivered to directly. Each worker also
+    subscribes to a Redis channel per user and conversation it holds
+    sockets for. Sends are handed to a background publisher that coalesces
+    them per channel into one PUBLISH, and only for channels that some other
+    worker subscribes to (checked with PUBSUB NUMSUB at most every
+    `remote_check_interval` seconds). Sending therefore never waits on
+    Redis, and a Redis outage only affects cross-worker delivery.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 256,
+        batch_size: int = 32,
+        max_unpublished: int = 10000,
+        remote_check_interval: float = 1.0
+    ):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_unpublished = max_unpublished
+        self.remote_check_interval = remote_check_interval
+        self._outbox: Dict[str, List[str]] = defaultdict(list)
+        self._unpublished = 0
+        self._outbox_ready = asyncio.Event()
+        self._remote: Dict[str, Tuple[bool, float]] = {}
+        self._publisher: Optional[asyncio.Task] = None
+        self._by_user: Dict[str, Set[ClientConnection]] = defaultdict(set)
+        self._by_conversation: Dict[str, Set[ClientConnection]] = defaultdict(set)
+        self._pubsub = None
+        self._channels: Set[str] = set()
+        self._listener: Optional[asyncio.Task] = None
+        self.gauges = ConnectionGauges()
+
+    @staticmethod
+    def _user_channel(user_id: str) -> str:
+        return f"ws:user:{user_id}"
+
+    @staticmethod
+    def _conversation_channel(conversation_id: str) -> str:
+        return f"ws:conversation:{conversation_id}"
+
+    def stats(self) -> Dict[str, int]:
+        connections = [
+            connection for connections in self._by_user.values() for connection in connections
+        ]
+        return {
+            **self.gauges.snapshot(),
+            "registered_sockets": len(connections),
+            "users": len(self._by_user),
+            "conversations": len(self._by_conversation),
+            "send_queue_depth": sum(connection.queue.qsize() for connection in connections)
+        }
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        conversation_id: Optional[str] = None
+    ) -> ClientConnection:
+        """Register an already-accepted socket"""
+        connection = ClientConnection(
+            websocket, user_id, conversation_id, self.queue_size, self.batch_size
+        )
+        self._by_user[user_id].add(connection)
+        channels = [self._user_channel(user_id)]
+        if conversation_id:
+            self._by_conversation[conversation_id].add(connection)
+            channels.append(self._conversation_channel(conversation_id))
+        await self._subscribe(channels)
+        return connection
+
+    async def disconnect(self, connection: ClientConnection):
+        await connection.close()
+        channels = []
+        for index, key, channel in (
+            (self._by_user, connection.user_id, self._user_channel(connection.user_id)),
+            (self._by_conversation, connection.conversation_id,
+             self._conversation_channel(connection.conversation_id or ""))
+        ):
+            if key is None or key not in index:
+                continue
+            index[key].discard(connection)
+            if not index[key]:
+                del index[key]
+                channels.append(channel)
+        await self._unsubscribe(channels)
+
+    async def send_to_user(self, user_id: str, message: Any):
+        await self._fan_out(self._user_channel(user_id), self._by_user.get(user_id, ()), message)
+
+    async def send_to_conversation(self, conversation_id: str, message: Any):
+        await self._fan_out(
+            self._conversation_channel(conversation_id),
+            self._by_conversation.get(conversation_id, ()),
+            message
+        )
+
+    async def send_personal_message(self, message: str, user_id: str):
+        await self.send_to_user(user_id, message)
+
+    async def _fan_out(self, channel: str, connections, message: Any):
+        text = message if isinstance(message, str) else json.dumps(message, default=str)
+        self._deliver(connections, text)
+        if self._unpublished >= self.max_unpublished:
+            # Redis is not keeping up; local delivery already happened
+            self.gauges.dropped_publishes += 1
+            return
+        self._outbox[channel].append(text)
+        self._unpublished += 1
+        self._outbox_ready.set()
+
+    async def _publish_loop(self):
+        """Coalesce queued sends per channel and publish those other workers listen to"""
+        while True:
+            await self._outbox_ready.wait()
+            self._outbox_ready.clear()
+            outbox, self._outbox = self._outbox, defaultdict(list)
+            self._unpublished = 0
+            try:
+                remote = await self._remote_channels(list(outbox))
+                if not remote:
+                    continue
+                async with async_redis_client.pipeline(transaction=False) as pipe:
+                    for channel in remote:
+                        pipe.publish(
+                            channel,
+                            json.dumps({"origin": WORKER_ID, "messages": outbox[channel]})
+                        )
+                    await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error publishing WebSocket messages: {e}")
+                await asyncio.sleep(1)
+
+    async def _remote_channels(self, channels: List[str]) -> List[str]:
+        """Channels with a subscriber on some other worker, from a short-lived NUMSUB cache"""
+        now = time.monotonic()
+        stale = [
+            channel for channel in channels
+            if self._remote.get(channel, (False, 0.0))[1] <= now
+        ]
+        if stale:
+            counts = await async_redis_client.pubsub_numsub(*stale)
+            expires_at = now + self.remote_check_interval
+            for channel, count in counts:
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                # Our own subscription is one of the subscribers
+                own = 1 if self._pubsub is not None and channel in self._channels else 0
+                self._remote[channel] = (count > own, expires_at)
+        for channel in [c for c, (_, expires_at) in self._remote.items() if expires_at <= now]:
+            del self._remote[channel]
+        return [channel for channel in channels if self._remote.get(channel, (False, 0.0))[0]]
+
+    @staticmethod
+    def _deliver(connections, text: str):
+        # Queueing never blocks, so one pass reaches every local socket
+        for connection in list(connections):
+            connection.send(text)
+
+    def _local_connections(self, channel: str) -> Set[ClientConnection]:
+        _, kind, key = channel.split(":", 2)
+        if kind == "user":
+            return self._by_user.get(key, set())
+        return self._by_conversation.get(key, set())
+
+    async def _subscribe(self, channels: List[str]):
+        new = [channel for channel in channels if channel not in self._channels]
+        self._channels.update(new)
+        if new and self._pubsub is not None:
+            try:
+                await self._pubsub.subscribe(*new)
+            except Exception as e:
+                print(f"Error subscribing to WebSocket channels: {e}")
+
+    async def _unsubscribe(self, channels: List[str]):
+        self._channels.difference_update(channels)
+        if channels and self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(*channels)
+            except Exception as e:
+                print(f"Error unsubscribing from WebSocket channels: {e}")
+
+    async def _listen(self):
+        """Deliver messages other workers published for sockets held here"""
+        node_channel = f"ws:node:{WORKER_ID}"
+        while True:
+            pubsub = async_redis_client.pubsub()
+            try:
+                # The node channel keeps the subscription alive while no sockets are open
+                channels = set(self._channels)
+                await pubsub.subscribe(node_channel, *channels)
+                self._pubsub = pubsub
+                # Sockets that came or went during that await were only recorded
+                joined, left = self._channels - channels, channels - self._channels
+                if joined:
+                    await pubsub.subscribe(*joined)
+                if left:
+                    await pubsub.unsubscribe(*left)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if event["origin"] == WORKER_ID:
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    connections = self._local_connections(channel)
+                    # Single-message events come from workers still on the old format
+                    for text in event.get("messages") or [event["message"]]:
+                        self._deliver(connections, text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WebSocket fan-out listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                self._pubsub = None
+                await pubsub.close()
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+        if self._publisher is None:
+            self._publisher = asyncio.create_task(self._publish_loop())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._publisher is not None:
+            self._publisher.cancel()
+            self._publisher = None
+        for connections in list(self._by_user.values()):
+            for connection in list(connections):
+                await connection.close(code=1001)
+        self._by_user.clear()
+        self._by_conversation.clear()
+        self._channels.clear()
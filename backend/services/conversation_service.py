@@ -1,14 +1,22 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from sqlalchemy import select, or_, and_, tuple_
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+import base64
+import hashlib
+import json
+from ..config import settings
 from ..models.conversation import Conversation, Message, Folder, Tag
-from ..schemas.conversation import ConversationCreate, ConversationUpdate, MessageCreate
+from ..schemas.conversation import ConversationCreate, ConversationResponse, MessageCreate
+from .cache_service import cache_service
+from .search_service import search_service
 from fastapi import HTTPException, status
 
 class ConversationService:
     async def create_conversation(
         self, 
-        db: Session, 
+        db: AsyncSession, 
         user_id: str, 
         data: ConversationCreate
     ) -> Conversation:
@@ -20,33 +28,120 @@ class ConversationService:
         )
         
         if data.tags:
-            tags = db.query(Tag).filter(
-                and_(Tag.id.in_(data.tags), Tag.user_id == user_id)
-            ).all()
-            conversation.tags = tags
+            result = await db.execute(
+                select(Tag).where(and_(Tag.id.in_(data.tags), Tag.user_id == user_id))
+            )
+            conversation.tags = list(result.scalars().all())
         
         db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
+        await db.flush()
+        await search_service.index_conversation(db, conversation)
+        await db.commit()
+        await self.invalidate_conversation_lists([user_id])
+        await db.refresh(conversation, ["tags", "folder", "messages"])
+        return conversation
+
+    async def ensure_conversation(
+        self,
+        db: AsyncSession,
+        conversation_id: str,
+        user_id: str,
+        title: str = "New conversation"
+    ) -> Conversation:
+        """Fetch a conversation owned by the user, creating it under that id if missing"""
+        conversation = await db.get(Conversation, conversation_id)
+        if conversation is None:
+            conversation = Conversation(id=conversation_id, user_id=user_id, title=title)
+            db.add(conversation)
+            await db.flush()
+            await search_service.index_conversation(db, conversation)
+            await db.commit()
+            await self.invalidate_conversation_lists([user_id])
+        elif conversation.user_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found"
+            )
+        return conversation
+
+    async def get_conversation(
+        self,
+        db: AsyncSession,
+        conversation_id: str,
+        user_id: str
+    ) -> Conversation:
+        return await self._get_owned_conversation(
+            db, conversation_id, user_id, self._response_loads()
+        )
+
+    async def _get_owned_conversation(
+        self,
+        db: AsyncSession,
+        conversation_id: str,
+        user_id: str,
+        options=()
+    ) -> Conversation:
+        result = await db.execute(
+            select(Conversation)
+            .options(*options)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.user_id == user_id
+            )
+        )
+        conversation = result.scalar_one_or_none()
+        if conversation is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found"
+            )
         return conversation
 
+    @staticmethod
+    def _response_loads():
+        # Async sessions cannot lazy-load, so load what responses serialize
+        return (
+            selectinload(Conversation.tags),
+            joinedload(Conversation.folder),
+            selectinload(Conversation.messages)
+        )
+
+    @staticmethod
+    def _list_loads():
+        # List views serialize tags and folder but never the message history
+        return (
+            selectinload(Conversation.tags),
+            joinedload(Conversation.folder),
+            raiseload(Conversation.messages, sql_only=True)
+        )
+
     async def get_conversations(
         self,
-        db: Session,
+        db: AsyncSession,
         user_id: str,
         folder_id: Optional[str] = None,
         search: Optional[str] = None,
         tag_ids: Optional[List[str]] = None,
         skip: int = 0,
-        limit: int = 50
-    ) -> List[Conversation]:
-        query = db.query(Conversation).filter(Conversation.user_id == user_id)
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Conversation], Optional[str]]:
+        """List conversations pinned first, newest first.
+
+        Pass the returned cursor back to fetch the next page; it seeks past
+        the last row on the composite index instead of scanning an offset.
+        """
+        query = (
+            select(Conversation)
+            .options(*self._list_loads())
+            .where(Conversation.user_id == user_id)
+        )
         
         if folder_id:
-            query = query.filter(Conversation.folder_id == folder_id)
+            query = query.where(Conversation.folder_id == folder_id)
         
         if search:
-            query = query.filter(
+            query = query.where(
                 or_(
                     Conversation.title.ilike(f"%{search}%"),
                     Conversation.description.ilike(f"%{search}%")
@@ -54,21 +149,117 @@ class ConversationService:
             )
         
         if tag_ids:
-            query = query.filter(Conversation.tags.any(Tag.id.in_(tag_ids)))
+            query = query.where(Conversation.tags.any(Tag.id.in_(tag_ids)))
+        
+        if cursor:
+            query = query.where(
+                tuple_(Conversation.is_pinned, Conversation.updated_at, Conversation.id)
+                < self._decode_cursor(cursor)
+            )
+        elif skip:
+            query = query.offset(skip)
         
-        return query.order_by(
-            Conversation.is_pinned.desc(),
-            Conversation.updated_at.desc()
-        ).offset(skip).limit(limit).all()
+        result = await db.execute(
+            query.order_by(
+                Conversation.is_pinned.desc(),
+                Conversation.updated_at.desc(),
+                Conversation.id.desc()
+            ).limit(limit + 1)
+        )
+        conversations = list(result.scalars().all())
+        
+        next_cursor = None
+        if len(conversations) > limit:
+            conversations = conversations[:limit]
+            next_cursor = self._encode_cursor(conversations[-1])
+        return conversations, next_cursor
+
+    async def get_conversations_page(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        folder_id: Optional[str] = None,
+        search: Optional[str] = None,
+        tag_ids: Optional[List[str]] = None,
+        skip: int = 0,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """`get_conversations` serialized for the response and cached across workers.
+
+        Pages are keyed on the user's list version, so any change to the
+        list makes every cached page of that user unreachable at once.
+        """
+        params = json.dumps([folder_id, search, sorted(tag_ids or []), skip, limit, cursor])
+        key = await cache_service.versioned_key(
+            f"conversations:{user_id}:{hashlib.sha256(params.encode()).hexdigest()}",
+            [self._list_cache_tag(user_id)]
+        )
+
+        async def compute():
+            conversations, next_cursor = await self.get_conversations(
+                db, user_id, folder_id, search, tag_ids, skip, limit, cursor
+            )
+            return {
+                "items": [
+                    ConversationResponse.model_validate(conversation).model_dump(mode="json")
+                    for conversation in conversations
+                ],
+                "next_cursor": next_cursor
+            }
+
+        page = await cache_service.get_or_compute(
+            key, compute, ttl=settings.CONVERSATION_LIST_CACHE_TTL
+        )
+        return page["items"], page["next_cursor"]
+
+    @staticmethod
+    def _list_cache_tag(user_id: str) -> str:
+        return f"conversations:{user_id}"
+
+    async def invalidate_conversation_lists(self, user_ids: Iterable[str]):
+        """Drop the cached conversation lists of these users.
+
+        Runs after the change is committed, so a cache outage is logged rather
+        than failing the write; stale pages then live at most one TTL.
+        """
+        try:
+            await cache_service.invalidate_tags(
+                [self._list_cache_tag(user_id) for user_id in set(user_ids)]
+            )
+        except Exception as e:
+            print(f"Error invalidating conversation lists: {e}")
+
+    @staticmethod
+    def _encode_cursor(conversation: Conversation) -> str:
+        payload = [
+            conversation.is_pinned,
+            conversation.updated_at.isoformat(),
+            conversation.id
+        ]
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple:
+        try:
+            is_pinned, updated_at, conversation_id = json.loads(
+                base64.urlsafe_b64decode(cursor.encode())
+            )
+            return bool(is_pinned), datetime.fromisoformat(updated_at), str(conversation_id)
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
 
     async def add_message(
         self,
-        db: Session,
+        db: AsyncSession,
         conversation_id: str,
         user_id: str,
         message_data: MessageCreate
     ) -> Message:
-        conversation = await self.get_conversation(db, conversation_id, user_id)
+        conversation = await self._get_owned_conversation(db, conversation_id, user_id)
         
         message = Message(
             conversation_id=conversation_id,
@@ -79,13 +270,17 @@ class ConversationService:
         
         db.add(message)
         conversation.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(message)
+        await db.flush()
+        await search_service.index_message(db, message, user_id)
+        await db.commit()
+        # The bumped updated_at reorders the user's list
+        await self.invalidate_conversation_lists([user_id])
+        await db.refresh(message)
         return message
 
     async def create_folder(
         self,
-        db: Session,
+        db: AsyncSession,
         user_id: str,
         name: str,
         description: Optional[str] = None
@@ -97,13 +292,13 @@ class ConversationService:
         )
         
         db.add(folder)
-        db.commit()
-        db.refresh(folder)
+        await db.commit()
+        await db.refresh(folder)
         return folder
 
     async def create_tag(
         self,
-        db: Session,
+        db: AsyncSession,
         user_id: str,
         name: str,
         color: Optional[str] = None
@@ -115,35 +310,19 @@ class ConversationService:
         )
         
         db.add(tag)
-        db.commit()
-        db.refresh(tag)
+        await db.commit()
+        await db.refresh(tag)
         return tag
 
     async def search_conversations(
         self,
-        db: Session,
+        db: AsyncSession,
         user_id: str,
         query: str,
-        include_messages: bool = False
-    ) -> List[Conversation]:
-        base_query = db.query(Conversation).filter(Conversation.user_id == user_id)
-        
-        if include_messages:
-            base_query = base_query.join(Message).filter(
-                or_(
-                    Conversation.title.ilike(f"%{query}%"),
-                    Conversation.description.ilike(f"%{query}%"),
-                    Message.content.ilike(f"%{query}%")
-                )
-            ).distinct()
-        else:
-            base_query = base_query.filter(
-                or_(
-                    Conversation.title.ilike(f"%{query}%"),
-                    Conversation.description.ilike(f"%{query}%")
-                )
-            )
-        
-        return base_query.order_by(Conversation.updated_at.desc()).all()
+        include_messages: bool = False,
+        limit: int = 20
+    ) -> List[Dict]:
+        """Ranked full-text search; each hit carries a highlighted snippet"""
+        return await search_service.search(db, user_id, query, include_messages, limit)
 
 conversation_service = ConversationService()
\ No newline at end of file
@@ -0,0 +1,95 @@
+# backend/services/embedding_cache.py
+
+from typing import Dict, Optional
+from collections import OrderedDict
+import hashlib
+import numpy as np
+from .cache_service import cache_service
+
+class EmbeddingCache:
+    """Query-embedding cache keyed by normalized text and model name.
+
+    A bounded in-process LRU sits in front of an optional Redis tier.
+    Vectors are stored as float32 bytes in Redis.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 10000,
+        use_redis: bool = False,
+        ttl: int = 86400
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.use_redis = use_redis
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse case and whitespace so near-identical queries share a key"""
+        return " ".join(text.lower().split())
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(
+            f"{self.model_name}\x00{self.normalize(text)}".encode("utf-8")
+        ).hexdigest()
+        return f"embedding:{digest}"
+
+    async def get(self, text: str) -> Optional[np.ndarray]:
+        key = self._key(text)
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+        if self.use_redis:
+            try:
+                data = await cache_service.get_bytes(key)
+            except Exception as e:
+                print(f"Error reading embedding cache: {e}")
+                data = None
+            if data:
+                vector = np.frombuffer(data, dtype=np.float32)
+                self._store(key, vector)
+                self.redis_hits += 1
+                return vector
+
+        self.misses += 1
+        return None
+
+    async def set(self, text: str, vector) -> np.ndarray:
+        key = self._key(text)
+        vector = np.asarray(vector, dtype=np.float32)
+        self._store(key, vector)
+
+        if self.use_redis:
+            try:
+                await cache_service.set_bytes(key, vector.tobytes(), self.ttl)
+            except Exception as e:
+                print(f"Error writing embedding cache: {e}")
+        return vector
+
+    def _store(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_rate": (self.hits + self.redis_hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,102 @@
+# backend/services/embedding_service.py
+
+from typing import Any, Callable, List, Optional, Sequence, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from .embedding_cache import EmbeddingCache
+
+class EmbeddingExecutor:
+    """Micro-batches concurrent embedding requests onto a worker pool.
+
+    Callers await `embed`; requests arriving within `max_wait_ms` of each
+    other are grouped into a single `encode_fn` call (up to `batch_size`
+    texts) so the event loop never blocks on model inference. An optional
+    `EmbeddingCache` short-circuits repeated queries.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Sequence[Any]],
+        batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        pool_size: int = 2,
+        cache: Optional[EmbeddingCache] = None
+    ):
+        self.encode_fn = encode_fn
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool_size,
+            thread_name_prefix="embedding"
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> Any:
+        """Embed a single text, batched with other concurrent callers"""
+        if self.cache is not None:
+            cached = await self.cache.get(text)
+            if cached is not None:
+                return cached
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        vector = await future
+
+        if self.cache is not None:
+            vector = await self.cache.set(text, vector)
+        return vector
+
+    async def embed_batch(self, texts: List[str]) -> Sequence[Any]:
+        """Embed an already-formed batch directly on the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.encode_fn, texts)
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._collect())
+
+    async def _collect(self):
+        """Gather queued requests into batches and dispatch them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        try:
+            vectors = await self.embed_batch(texts)
+        except Exception as e:
+            print(f"Error embedding batch: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    async def close(self):
+        """Stop batching and release the worker pool"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,269 @@
+# backend/services/faiss_index.py
+
+from typing import Dict, List, Optional
+import argparse
+import os
+import time
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+def factory_string(index_type: str, config) -> str:
+    """Translate a configured index type into a faiss index_factory string"""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{config.FAISS_HNSW_M}"
+    if index_type == "ivf_flat":
+        return f"IVF{config.FAISS_IVF_NLIST},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{config.FAISS_IVF_NLIST},PQ{config.FAISS_PQ_M}x{config.FAISS_PQ_NBITS}"
+    raise ValueError(f"Unknown FAISS index type {index_type}")
+
+def index_type_of(index: faiss.Index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return "flat"
+
+def min_vectors(index_type: str, config) -> int:
+    """Corpus size below which the configured ANN index is not worth building"""
+    if index_type == "flat":
+        return 0
+    if index_type.startswith("ivf"):
+        # faiss wants roughly 39 training points per IVF centroid
+        return max(config.FAISS_ANN_MIN_VECTORS, config.FAISS_IVF_NLIST * 39)
+    return config.FAISS_ANN_MIN_VECTORS
+
+def build_index(
+    vectors: np.ndarray,
+    config,
+    index_type: Optional[str] = None
+) -> faiss.Index:
+    """Build, train on a sample if needed, and fill an index of the configured type"""
+    index_type = index_type or config.FAISS_INDEX_TYPE
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], factory_string(index_type, config))
+
+    if index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = config.FAISS_HNSW_EF_CONSTRUCTION
+
+    if not index.is_trained:
+        sample_size = min(len(vectors), config.FAISS_TRAIN_SAMPLE_SIZE)
+        sample = np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)
+        index.train(vectors[sample])
+
+    if len(vectors):
+        index.add(vectors)
+    apply_search_params(index, config.FAISS_IVF_NPROBE, config.FAISS_HNSW_EF_SEARCH)
+    return index
+
+def apply_search_params(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+):
+    """Set runtime search knobs on indexes that support them"""
+    index_type = index_type_of(index)
+    params = faiss.ParameterSpace()
+    if nprobe is not None and index_type.startswith("ivf"):
+        params.set_index_parameter(index, "nprobe", nprobe)
+    if ef_search is not None and index_type == "hnsw":
+        params.set_index_parameter(index, "efSearch", ef_search)
+
+def is_lossy(index_type: str) -> bool:
+    """Whether reconstructed vectors only approximate what was added"""
+    return index_type == "ivf_pq"
+
+def read_index_mapped(path: str) -> faiss.Index:
+    """Open an index file memory-mapped so workers share it through the page cache.
+
+    IO_FLAG_MMAP only maps IVF inverted lists; flat and HNSW storage would
+    still be copied into private memory. IO_FLAG_MMAP_IFC maps the stored
+    codes of every index type in place. The mapping is read-only, so the
+    returned index must not be added to.
+    """
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if flag is None:
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        if not index_type_of(index).startswith("ivf"):
+            print(
+                f"Warning: this faiss build cannot map {index_type_of(index)} storage; "
+                f"{path} is loaded into private memory"
+            )
+        return index
+    return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+
+def search_params(
+    index: faiss.Index,
+    excluded: Optional[np.ndarray] = None
+) -> Optional[faiss.SearchParameters]:
+    """Per-query parameters that skip `excluded` positions inside faiss.
+
+    The index's current nprobe/efSearch are carried over, since passing
+    parameters replaces them for the call.
+    """
+    if excluded is None or not len(excluded):
+        return None
+    selector = faiss.IDSelectorNot(
+        faiss.IDSelectorBatch(np.ascontiguousarray(excluded, dtype=np.int64))
+    )
+    index_type = index_type_of(index)
+    if index_type.startswith("ivf"):
+        params = faiss.SearchParametersIVF(
+            sel=selector, nprobe=faiss.extract_index_ivf(index).nprobe
+        )
+    elif index_type == "hnsw":
+        params = faiss.SearchParametersHNSW(
+            sel=selector, efSearch=faiss.downcast_index(index).hnsw.efSearch
+        )
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    # The wrappers do not own the selectors; keep them alive with the params
+    params.referenced_objects = [selector]
+    return params
+
+def compact_ivf(index: faiss.Index, keep: np.ndarray) -> faiss.Index:
+    """Copy an IVF index keeping only the sorted positions `keep`, renumbered 0..n-1.
+
+    Stored codes are moved as-is into a clone sharing the trained quantizer,
+    so a lossy index (IVF-PQ) is compacted without decoding and re-encoding.
+    """
+    keep = np.ascontiguousarray(keep, dtype=np.int64)
+    compacted = faiss.clone_index(index)
+    compacted.reset()
+    source = faiss.extract_index_ivf(index).invlists
+    target = faiss.extract_index_ivf(compacted).invlists
+    code_size = source.code_size
+
+    for list_no in range(source.nlist):
+        size = source.list_size(list_no)
+        if not size:
+            continue
+        ids_ptr = source.get_ids(list_no)
+        codes_ptr = source.get_codes(list_no)
+        ids = faiss.rev_swig_ptr(ids_ptr, size).copy()
+        codes = faiss.rev_swig_ptr(codes_ptr, size * code_size).copy().reshape(size, code_size)
+        source.release_ids(list_no, ids_ptr)
+        source.release_codes(list_no, codes_ptr)
+
+        ranks = np.searchsorted(keep, ids)
+        live = (ranks < len(keep)) & (keep[np.minimum(ranks, len(keep) - 1)] == ids)
+        if not live.any():
+            continue
+        new_ids = np.ascontiguousarray(ranks[live], dtype=np.int64)
+        new_codes = np.ascontiguousarray(codes[live])
+        target.add_entries(
+            list_no, len(new_ids), faiss.swig_ptr(new_ids), faiss.swig_ptr(new_codes)
+        )
+
+    compacted.ntotal = len(keep)
+    faiss.extract_index_ivf(compacted).ntotal = len(keep)
+    return compacted
+
+def reconstruct_all(index: faiss.Index, positions: Optional[np.ndarray] = None) -> np.ndarray:
+    """Recover stored vectors from an index without re-embedding"""
+    source = index
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        source = faiss.clone_index(index)
+        faiss.extract_index_ivf(source).make_direct_map()
+    if positions is None:
+        positions = np.arange(index.ntotal, dtype=np.int64)
+    if not len(positions):
+        return np.empty((0, index.d), dtype=np.float32)
+    return source.reconstruct_batch(positions)
+
+def benchmark(
+    base: np.ndarray,
+    queries: np.ndarray,
+    config,
+    k: int = 10,
+    nprobes: List[int] = (1, 4, 16, 64),
+    ef_searches: List[int] = (16, 32, 64, 128)
+) -> List[Dict]:
+    """Measure recall@k against exact search and per-query latency"""
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        try:
+            index = build_index(base, config, index_type)
+        except Exception as e:
+            print(f"Skipping {index_type}: {e}")
+            continue
+        build_seconds = time.perf_counter() - start
+
+        if index_type.startswith("ivf"):
+            knobs = [("nprobe", n) for n in nprobes if n <= config.FAISS_IVF_NLIST]
+        elif index_type == "hnsw":
+            knobs = [("efSearch", ef) for ef in ef_searches]
+        else:
+            knobs = [(None, None)]
+
+        for knob, value in knobs:
+            if knob == "nprobe":
+                apply_search_params(index, nprobe=value)
+            elif knob == "efSearch":
+                apply_search_params(index, ef_search=value)
+
+            latencies = []
+            found = np.empty_like(truth)
+            for i, query in enumerate(queries):
+                start = time.perf_counter()
+                _, labels = index.search(query.reshape(1, -1), k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found[i] = labels[0]
+
+            recall = np.mean([
+                len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))
+            ])
+            rows.append({
+                "index_type": index_type,
+                "param": f"{knob}={value}" if knob else "-",
+                "recall": float(recall),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "build_s": build_seconds
+            })
+    return rows
+
+def format_report(rows: List[Dict], corpus_size: int, k: int) -> str:
+    lines = [
+        f"Recall@{k} vs latency over {corpus_size} vectors",
+        f"{'index':<10}{'param':<14}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}{'build s':>10}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['index_type']:<10}{row['param']:<14}{row['recall']:>8.3f}"
+            f"{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['build_s']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    from ..config import settings
+
+    parser = argparse.ArgumentParser(
+        description="Recall-versus-latency report for FAISS index types on the local corpus"
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    corpus = reconstruct_all(
+        faiss.read_index(os.path.join(settings.FAISS_INDEX_PATH, "index.faiss"))
+    )
+    # Hold queries out of the base set so they do not trivially match themselves
+    order = np.random.default_rng(0).permutation(len(corpus))
+    queries, base = corpus[order[:args.queries]], corpus[order[args.queries:]]
+
+    rows = benchmark(base, queries, settings, k=args.k)
+    print(format_report(rows, len(base), args.k))
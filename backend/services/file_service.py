@@ -5,14 +5,15 @@ from typing import List
 import magic
 import uuid
 from ..database.models import DBFile
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 class FileService:
     def __init__(self, upload_dir: str = "uploads"):
         self.upload_dir = upload_dir
         os.makedirs(upload_dir, exist_ok=True)
 
-    async def save_file(self, file: UploadFile, user_id: str, db: Session) -> DBFile:
+    async def save_file(self, file: UploadFile, user_id: str, db: AsyncSession) -> DBFile:
         # Generate unique filename
         file_id = str(uuid.uuid4())
         extension = os.path.splitext(file.filename)[1]
@@ -39,19 +40,23 @@ class FileService:
         )
 
         db.add(db_file)
-        db.commit()
-        db.refresh(db_file)
+        await db.commit()
+        await db.refresh(db_file)
 
         return db_file
 
-    async def get_user_files(self, user_id: str, db: Session) -> List[DBFile]:
-        return db.query(DBFile).filter(DBFile.user_id == user_id).all()
+    async def get_user_files(self, user_id: str, db: AsyncSession) -> List[DBFile]:
+        result = await db.execute(select(DBFile).where(DBFile.user_id == user_id))
+        return list(result.scalars().all())
 
-    async def delete_file(self, file_id: str, user_id: str, db: Session) -> bool:
-        file = db.query(DBFile).filter(
-            DBFile.id == file_id,
-            DBFile.user_id == user_id
-        ).first()
+    async def delete_file(self, file_id: str, user_id: str, db: AsyncSession) -> bool:
+        result = await db.execute(
+            select(DBFile).where(
+                DBFile.id == file_id,
+                DBFile.user_id == user_id
+            )
+        )
+        file = result.scalar_one_or_none()
 
         if not file:
             return False
@@ -63,7 +68,7 @@ class FileService:
             pass
 
         # Delete database entry
-        db.delete(file)
-        db.commit()
+        await db.delete(file)
+        await db.commit()
 
         return True
\ No newline at end of file
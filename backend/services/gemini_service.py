@@ -1,41 +1,95 @@
 import google.generativeai as genai
-from typing import List, Dict
+from typing import List, Dict, AsyncIterator, Optional
 from ..config import settings
 from ..models.conversation import Message
+from .history_manager import message_tokens
 
 class GeminiService:
     def __init__(self):
         genai.configure(api_key=settings.GOOGLE_API_KEY)
         self.model = genai.GenerativeModel('gemini-pro')
+        self.generation_config = {
+            'temperature': settings.TEMPERATURE,
+            'max_output_tokens': settings.MAX_OUTPUT_TOKENS,
+        }
         
     async def generate_response(
         self, 
         messages: List[Message], 
         context: Dict = None,
-        tools: List[Dict] = None
+        tools: List[Dict] = None,
+        summary: str = ""
     ) -> str:
-        # Format conversation history
-        formatted_messages = self._format_messages(messages)
-        
-        # Prepare prompt with context
-        prompt = self._prepare_prompt(formatted_messages, context)
+        # Prepare prompt from history and context
+        prompt = self._build_prompt(messages, context, summary)
         
         # Generate response
         response = await self.model.generate_content_async(
             prompt,
-            generation_config={
-                'temperature': settings.TEMPERATURE,
-                'max_output_tokens': settings.MAX_OUTPUT_TOKENS,
-            }
+            generation_config=self.generation_config
         )
         
         return response.text
 
-    def _format_messages(self, messages: List[Message]) -> str:
+    async def generate_response_stream(
+        self,
+        messages: List[Message],
+        context: Dict = None,
+        tools: List[Dict] = None,
+        summary: str = ""
+    ) -> AsyncIterator[str]:
+        """Generate a response, yielding text chunks as they arrive"""
+        prompt = self._build_prompt(messages, context, summary)
+        
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config=self.generation_config,
+            stream=True
+        )
+        
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def summarize(self, summary: str, messages: List[Message]) -> str:
+        """Fold older turns into the running conversation summary"""
+        prompt = (
+            "Update the summary of this conversation with the new turns. Keep facts, "
+            "decisions, names and open questions; drop pleasantries. Reply with the "
+            f"summary only, in at most {settings.HISTORY_SUMMARY_MAX_TOKENS} tokens.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\n"
+            f"New turns:\n{self._format_messages(messages, budget=None)}"
+        )
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config={
+                'temperature': 0.2,
+                'max_output_tokens': settings.HISTORY_SUMMARY_MAX_TOKENS,
+            }
+        )
+        return response.text.strip()
+
+    def _build_prompt(self, messages: List[Message], context: Dict = None, summary: str = "") -> str:
+        formatted_messages = self._format_messages(messages)
+        if summary:
+            formatted_messages = f"Summary of earlier conversation:\n{summary}\n\n{formatted_messages}"
+        return self._prepare_prompt(formatted_messages, context)
+
+    def _format_messages(
+        self,
+        messages: List[Message],
+        budget: Optional[int] = settings.HISTORY_TOKEN_BUDGET
+    ) -> str:
+        # Walk back from the newest turn until the token budget is spent
         formatted = []
-        for msg in messages[-settings.MAX_HISTORY_LENGTH:]:
+        used = 0
+        for msg in reversed(messages):
+            tokens = message_tokens(msg)
+            if budget and formatted and used + tokens > budget:
+                break
             formatted.append(f"{msg.role}: {msg.content}")
-        return "\n".join(formatted)
+            used += tokens
+        return "\n".join(reversed(formatted))
 
     def _prepare_prompt(self, messages: str, context: Dict = None) -> str:
         prompt = messages
@@ -44,4 +98,4 @@ class GeminiService:
                 [f"- {k}: {v}" for k, v in context.items()]
             )
             prompt = context_str + "\n" + prompt
-        return prompt   
\ No newline at end of file
+        return prompt   
@@ -0,0 +1,185 @@
+# backend/services/history_manager.py
+
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict, deque
+import asyncio
+from ..models.conversation import Message
+from .cache_service import cache_service
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English prose)"""
+    return len(text) // 4 + 1
+
+def message_tokens(message: Message) -> int:
+    return estimate_tokens(f"{message.role}: {message.content}")
+
+class ConversationHistory:
+    """Recent raw turns plus a rolling summary of everything older"""
+
+    def __init__(self, summary: str = ""):
+        self.summary = summary
+        self.messages: Deque[Message] = deque()
+        self.tokens = 0
+        self.evicted: List[Message] = []
+        self.dropped = 0
+        self.summarizing: Optional[asyncio.Task] = None
+
+class HistoryManager:
+    """Keeps per-conversation history inside a fixed token budget.
+
+    Appending a message that pushes the raw window past `token_budget`
+    (or `max_messages`) evicts the oldest turns until the window is back
+    under `low_water` of those limits, so a summary covers a batch of turns
+    and not one turn per append. Evicted turns are folded into a rolling
+    summary in the background by `summarize_fn(summary, messages)`, at most
+    one call per conversation at a time, and the summary is cached so it
+    survives restarts and other workers. If summarizing keeps failing, only
+    the newest `max_unsummarized` evicted turns are kept and the summary
+    notes how many were lost. At most `max_conversations` histories are kept
+    in memory; one dropped from memory has its evicted turns summarized first.
+    A history that is not resident (dropped from the LRU, after a restart or
+    first seen on this worker) reloads its summary from the cache and its
+    recent turns through `load_recent_fn(conversation_id, limit)`.
+    """
+
+    def __init__(
+        self,
+        summarize_fn: Callable[[str, List[Message]], Awaitable[str]],
+        load_recent_fn: Optional[Callable[[str, int], Awaitable[List[Message]]]] = None,
+        token_budget: int = 3000,
+        max_messages: int = 50,
+        max_conversations: int = 1000,
+        summary_ttl: int = 86400,
+        low_water: float = 0.6,
+        max_unsummarized: int = 200
+    ):
+        self.summarize_fn = summarize_fn
+        self.load_recent_fn = load_recent_fn
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.max_conversations = max_conversations
+        self.summary_ttl = summary_ttl
+        self.low_water = low_water
+        self.max_unsummarized = max_unsummarized
+        self._histories: "OrderedDict[str, ConversationHistory]" = OrderedDict()
+        self._flushing: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _summary_key(conversation_id: str) -> str:
+        return f"history_summary:{conversation_id}"
+
+    async def _history(self, conversation_id: str) -> ConversationHistory:
+        history = self._histories.get(conversation_id)
+        if history is None:
+            loaded = await self._load(conversation_id)
+            # Another coroutine may have loaded it while we awaited the cache
+            history = self._histories.setdefault(conversation_id, loaded)
+            while len(self._histories) > self.max_conversations:
+                self._flush_dropped(*self._histories.popitem(last=False))
+        self._histories.move_to_end(conversation_id)
+        return history
+
+    def _flush_dropped(self, conversation_id: str, history: ConversationHistory):
+        """Summarize the evicted turns of a history that is leaving memory"""
+        if history.evicted and (history.summarizing is None or history.summarizing.done()):
+            history.summarizing = self._spawn(self._summarize(conversation_id, history))
+        if history.summarizing is None or history.summarizing.done():
+            return
+        task = history.summarizing
+        self._flushing[conversation_id] = task
+        task.add_done_callback(
+            lambda _: self._flushing.pop(conversation_id, None)
+            if self._flushing.get(conversation_id) is task else None
+        )
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _load(self, conversation_id: str) -> ConversationHistory:
+        flushing = self._flushing.get(conversation_id)
+        if flushing is not None:
+            # Read the summary only once the dropped copy has written it
+            await asyncio.wait({flushing})
+        history = ConversationHistory(
+            await cache_service.get(self._summary_key(conversation_id)) or ""
+        )
+        if self.load_recent_fn is None:
+            return history
+        try:
+            recent = await self.load_recent_fn(conversation_id, self.max_messages)
+        except Exception as e:
+            print(f"Error loading recent conversation turns: {e}")
+            return history
+        # Newest turns that fit the budget; anything older is already in the summary
+        for message in reversed(recent):
+            tokens = message_tokens(message)
+            if history.messages and history.tokens + tokens > self.token_budget:
+                break
+            history.messages.appendleft(message)
+            history.tokens += tokens
+        return history
+
+    async def append(self, conversation_id: str, message: Message):
+        history = await self._history(conversation_id)
+        history.messages.append(message)
+        history.tokens += message_tokens(message)
+
+        if history.tokens > self.token_budget or len(history.messages) > self.max_messages:
+            token_target = int(self.token_budget * self.low_water)
+            message_target = max(1, int(self.max_messages * self.low_water))
+            # Always keep the newest message, even if it alone exceeds the budget
+            while len(history.messages) > 1 and (
+                history.tokens > token_target or len(history.messages) > message_target
+            ):
+                oldest = history.messages.popleft()
+                history.tokens -= message_tokens(oldest)
+                history.evicted.append(oldest)
+            self._cap_unsummarized(history)
+
+        # A running summary picks up turns evicted meanwhile, so never start a second
+        if history.evicted and (history.summarizing is None or history.summarizing.done()):
+            history.summarizing = self._spawn(self._summarize(conversation_id, history))
+
+    async def window(self, conversation_id: str) -> Tuple[str, List[Message]]:
+        """Rolling summary and the recent raw messages that fit the budget"""
+        history = await self._history(conversation_id)
+        return history.summary, list(history.messages)
+
+    async def _summarize(self, conversation_id: str, history: ConversationHistory):
+        # Turns evicted while a summary is being written are picked up by the next pass
+        while history.evicted:
+            batch, history.evicted = history.evicted, []
+            summary, dropped = history.summary, history.dropped
+            if dropped:
+                summary = (
+                    f"{summary}\n[{dropped} earlier messages were lost "
+                    f"before they could be summarized]"
+                ).strip()
+            try:
+                history.summary = await self.summarize_fn(summary, batch)
+            except Exception as e:
+                print(f"Error summarizing conversation history: {e}")
+                history.evicted[:0] = batch
+                self._cap_unsummarized(history)
+                return
+            history.dropped -= dropped
+            try:
+                await cache_service.set(
+                    self._summary_key(conversation_id), history.summary, self.summary_ttl
+                )
+            except Exception as e:
+                print(f"Error caching conversation summary: {e}")
+
+    def _cap_unsummarized(self, history: ConversationHistory):
+        # Keep the newest evicted turns; the oldest are only counted
+        overflow = len(history.evicted) - self.max_unsummarized
+        if overflow > 0:
+            del history.evicted[:overflow]
+            history.dropped += overflow
+
+    def forget(self, conversation_id: str):
+        self._histories.pop(conversation_id, None)
@@ -0,0 +1,94 @@
+# backend/services/index_persistence.py
+
+from typing import Callable, Optional, Set
+import asyncio
+import glob
+import os
+import shutil
+import time
+
+class IndexPersistenceManager:
+    """Debounced, atomic persistence for an on-disk vector index.
+
+    Mutations call `mark_dirty`; the index is written at most once per
+    `flush_interval` seconds, or immediately after `max_pending` mutations.
+    Each flush writes a fresh generation directory next to `path` and then
+    atomically repoints the `path` symlink at it, so readers never observe a
+    half-written index.
+    """
+
+    def __init__(
+        self,
+        save_fn: Callable[[str], None],
+        path: str,
+        flush_interval: float = 5.0,
+        max_pending: int = 100,
+        keep_generations: int = 2,
+        lock: Optional[asyncio.Lock] = None
+    ):
+        self.save_fn = save_fn
+        self.path = os.path.abspath(path)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.keep_generations = keep_generations
+        self.lock = lock or asyncio.Lock()
+        self.pending = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._flush_lock = asyncio.Lock()
+
+    def mark_dirty(self):
+        """Record a mutation and schedule a flush"""
+        self.pending += 1
+        if self.pending == self.max_pending:
+            task = asyncio.create_task(self._flush_after(0))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_after(self.flush_interval))
+
+    async def _flush_after(self, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Error flushing index: {e}")
+
+    async def flush(self):
+        """Write the index now if there are unsaved mutations"""
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            async with self.lock:
+                pending = self.pending
+                self.pending = 0
+                try:
+                    await asyncio.to_thread(self._write_generation)
+                except Exception:
+                    self.pending += pending
+                    raise
+
+    def _write_generation(self):
+        parent, name = os.path.split(self.path)
+        os.makedirs(parent, exist_ok=True)
+        generation = os.path.join(parent, f".{name}.{time.time_ns()}")
+        self.save_fn(generation)
+
+        # Move a pre-existing plain directory aside so the symlink can replace it
+        if os.path.isdir(self.path) and not os.path.islink(self.path):
+            os.replace(self.path, os.path.join(parent, f".{name}.0"))
+
+        link = f"{generation}.link"
+        os.symlink(os.path.basename(generation), link)
+        os.replace(link, self.path)
+        self._prune_generations(parent, name)
+
+    def _prune_generations(self, parent: str, name: str):
+        generations = sorted(
+            (path for path in glob.glob(os.path.join(parent, f".{name}.*"))
+             if not path.endswith(".link")),
+            key=lambda path: int(path.rsplit(".", 1)[1])
+        )
+        for path in generations[:-self.keep_generations]:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,46 @@
+# backend/services/local_cache.py
+
+from typing import Any, Optional, Tuple
+from collections import OrderedDict
+import fnmatch
+import time
+
+_MISSING = object()
+
+class LocalCache:
+    """Bounded, TTL-aware in-process LRU used as the L1 tier in front of Redis"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if not self.max_entries:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear_pattern(self, pattern: str):
+        for key in [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,205 @@
+# backend/services/message_journal.py
+
+from typing import Any, Callable, Deque, Dict, List, Optional
+from collections import deque
+from datetime import datetime
+import asyncio
+import uuid
+from sqlalchemy import insert, update
+from sqlalchemy.exc import InterfaceError, OperationalError
+from ..models.conversation import Conversation, Message
+from .conversation_service import conversation_service
+from .search_service import search_service
+
+class MessageJournal:
+    """Write-behind persistence for chat messages.
+
+    `append` buffers a message and returns its id without touching the
+    database. A background task writes the buffer in one transaction per
+    batch: a bulk insert of the messages plus a single `updated_at` bump per
+    conversation. Batches go out every `flush_interval` seconds, or as soon
+    as `max_pending` messages are waiting, which bounds how much a crash can
+    lose. When `max_buffered` messages are stuck (e.g. the database is down)
+    `append` waits on a flush instead of growing without limit.
+
+    A batch that fails because the database is unreachable is re-queued
+    as-is. Any other failure means some row is bad (e.g. its conversation
+    was deleted): the batch is bisected so the good rows still commit,
+    and rows that fail on their own go to `dead_letters` instead of
+    blocking every later flush.
+
+    With `write_through=True` every `append` waits until its message is
+    committed; concurrent turns still share a commit.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        flush_interval: float = 1.0,
+        max_pending: int = 200,
+        max_buffered: int = 10000,
+        write_through: bool = False,
+        max_dead_letters: int = 1000
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_buffered = max_buffered
+        self.write_through = write_through
+        self._buffer: List[Dict[str, Any]] = []
+        self._inflight: List[Dict[str, Any]] = []
+        self.dead_letters: Deque[Dict[str, Any]] = deque(maxlen=max_dead_letters)
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def append(
+        self,
+        conversation_id: str,
+        user_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict] = None
+    ) -> str:
+        """Queue a message for persistence and return its id"""
+        if len(self._buffer) >= self.max_buffered:
+            await self.flush()
+
+        message_id = str(uuid.uuid4())
+        self._buffer.append({
+            "id": message_id,
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.utcnow(),
+            "metadata": metadata or {}
+        })
+
+        if self.write_through:
+            await self.flush()
+        elif len(self._buffer) >= self.max_pending:
+            self._wake.set()
+        return message_id
+
+    def pending_for(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Unwritten entries of one conversation, including a batch being written, oldest first"""
+        return [
+            entry for entry in self._inflight + self._buffer
+            if entry["conversation_id"] == conversation_id
+        ]
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing message journal: {e}")
+
+    async def flush(self):
+        """Commit everything buffered so far"""
+        async with self._flush_lock:
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return
+            # Readers still see the batch through pending_for until it is committed
+            self._inflight = batch
+            try:
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    if self._is_transient(e):
+                        # Keep ordering: the failed batch goes back ahead of newer messages
+                        self._buffer[:0] = batch
+                        raise
+                    await self._write_isolating_failures(batch)
+                except BaseException:
+                    self._buffer[:0] = batch
+                    raise
+            finally:
+                self._inflight = []
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """Connection-level failures are retried; anything else points at the data"""
+        return (
+            isinstance(error, (OperationalError, InterfaceError, OSError, asyncio.TimeoutError))
+            or getattr(error, "connection_invalidated", False)
+        )
+
+    async def _write_isolating_failures(self, batch: List[Dict[str, Any]]):
+        """Bisect a failing batch until the bad rows are alone, dead-lettering those"""
+        pending = [batch]
+        while pending:
+            chunk = pending.pop()
+            try:
+                await self._write(chunk)
+            except Exception as e:
+                if self._is_transient(e):
+                    self._requeue(chunk, pending)
+                    raise
+                if len(chunk) == 1:
+                    print(f"Error persisting message {chunk[0]['id']}, dead-lettered: {e}")
+                    self.dead_letters.append({**chunk[0], "error": str(e)})
+                    continue
+                middle = len(chunk) // 2
+                # Stack order keeps the earlier half first
+                pending.extend([chunk[middle:], chunk[:middle]])
+            except BaseException:
+                # e.g. cancelled at shutdown: nothing unwritten may be lost
+                self._requeue(chunk, pending)
+                raise
+
+    def _requeue(self, chunk: List[Dict[str, Any]], pending: List[List[Dict[str, Any]]]):
+        remaining = [entry for part in reversed(pending) for entry in part]
+        self._buffer[:0] = chunk + remaining
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        updated_at: Dict[str, datetime] = {}
+        for entry in batch:
+            conversation_id = entry["conversation_id"]
+            updated_at[conversation_id] = max(
+                entry["created_at"], updated_at.get(conversation_id, entry["created_at"])
+            )
+
+        async with self.session_factory() as db:
+            await db.execute(
+                insert(Message),
+                [{key: value for key, value in entry.items() if key != "user_id"} for entry in batch]
+            )
+            await db.execute(
+                update(Conversation),
+                [
+                    {"id": conversation_id, "updated_at": timestamp}
+                    for conversation_id, timestamp in updated_at.items()
+                ]
+            )
+            await search_service.index_messages(db, batch)
+            await db.commit()
+        await conversation_service.invalidate_conversation_lists(
+            entry["user_id"] for entry in batch
+        )
+
+    async def close(self):
+        """Stop the background task and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
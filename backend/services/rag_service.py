@@ -3,10 +3,17 @@
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import FAISS, Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
+import asyncio
 import os
-import json
+import pickle
+import faiss
+import numpy as np
 from datetime import datetime
+from .embedding_service import EmbeddingExecutor
+from .embedding_cache import EmbeddingCache
+from .index_persistence import IndexPersistenceManager
+from . import faiss_index
 
 class RAGService:
     def __init__(self, config):
@@ -14,13 +21,54 @@ class RAGService:
         
         # Initialize embedding model
         self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2",
-            model_kwargs={'device': 'cpu'}
+            model_name=config.EMBEDDING_MODEL,
+            model_kwargs={'device': config.EMBEDDING_DEVICE}
+        )
+        self.embedder = EmbeddingExecutor(
+            self.embeddings.embed_documents,
+            batch_size=config.EMBEDDING_BATCH_SIZE,
+            max_wait_ms=config.EMBEDDING_BATCH_WAIT_MS,
+            pool_size=config.EMBEDDING_POOL_SIZE,
+            cache=EmbeddingCache(
+                config.EMBEDDING_MODEL,
+                max_entries=config.EMBEDDING_CACHE_SIZE,
+                use_redis=config.EMBEDDING_CACHE_REDIS,
+                ttl=config.EMBEDDING_CACHE_TTL
+            )
         )
 
+        # Reader workers load the index memory-mapped and never write it
+        self.is_reader = (
+            config.VECTOR_STORE_TYPE == "faiss" and config.FAISS_MODE == "reader"
+        )
+        self._generation: Optional[str] = None
+
         # Initialize vector store (choose one)
         self.vector_store = self._initialize_vector_store()
         
+        # Deleted FAISS docstore IDs awaiting compaction, and the search
+        # parameters that exclude their index positions inside faiss
+        self._tombstones: Set[str] = set()
+        self._search_params: Optional[faiss.SearchParameters] = None
+        self._index_lock = asyncio.Lock()
+        self._compaction_task: Optional[asyncio.Task] = None
+        self.persistence: Optional[IndexPersistenceManager] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        if isinstance(self.vector_store, FAISS):
+            self._tombstones = self._load_tombstones(self.vector_store)
+            self.set_search_params(
+                self.config.FAISS_IVF_NPROBE, self.config.FAISS_HNSW_EF_SEARCH
+            )
+        if isinstance(self.vector_store, FAISS) and not self.is_reader:
+            self.persistence = IndexPersistenceManager(
+                lambda path: self.vector_store.save_local(path),
+                self.config.FAISS_INDEX_PATH,
+                flush_interval=self.config.FAISS_FLUSH_INTERVAL,
+                max_pending=self.config.FAISS_FLUSH_MAX_PENDING,
+                keep_generations=self.config.FAISS_KEEP_GENERATIONS,
+                lock=self._index_lock
+            )
+        
         # Text splitter for document chunking
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
@@ -32,6 +80,9 @@ class RAGService:
         """Initialize the vector store with either FAISS or Chroma"""
         if self.config.VECTOR_STORE_TYPE == "faiss":
             if os.path.exists(self.config.FAISS_INDEX_PATH):
+                if self.is_reader:
+                    self._generation = os.path.realpath(self.config.FAISS_INDEX_PATH)
+                    return self._load_mmap_index(self._generation)
                 return FAISS.load_local(
                     self.config.FAISS_INDEX_PATH, 
                     self.embeddings
@@ -46,12 +97,88 @@ class RAGService:
                 embedding_function=self.embeddings
             )
 
+    def _load_mmap_index(self, folder: str) -> FAISS:
+        """Load a published index generation memory-mapped and read-only"""
+        index = faiss_index.read_index_mapped(os.path.join(folder, "index.faiss"))
+        with open(os.path.join(folder, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(
+            self.embeddings.embed_query,
+            index,
+            docstore,
+            index_to_docstore_id
+        )
+
+    @staticmethod
+    def _load_tombstones(store: FAISS) -> Set[str]:
+        return {
+            doc_id for doc_id, doc in store.docstore._dict.items()
+            if doc.metadata.get('_deleted')
+        }
+
+    def start_index_watcher(self):
+        """Start polling for new index generations published by the writer"""
+        if self.is_reader and self._reload_task is None:
+            self._reload_task = asyncio.create_task(self._watch_generations())
+
+    async def _watch_generations(self):
+        while True:
+            await asyncio.sleep(self.config.FAISS_RELOAD_INTERVAL)
+            try:
+                generation = os.path.realpath(self.config.FAISS_INDEX_PATH)
+                if generation == self._generation or not os.path.exists(generation):
+                    continue
+                store = await asyncio.to_thread(self._load_mmap_index, generation)
+                faiss_index.apply_search_params(
+                    store.index,
+                    self.config.FAISS_IVF_NPROBE,
+                    self.config.FAISS_HNSW_EF_SEARCH
+                )
+                self.vector_store = store
+                self._tombstones = self._load_tombstones(store)
+                self._refresh_search_params()
+                self._generation = generation
+            except Exception as e:
+                print(f"Error reloading FAISS index: {e}")
+
+    def _ensure_writer(self):
+        if self.is_reader:
+            raise RuntimeError("FAISS index is read-only in reader mode")
+
+    def _search_by_vector(
+        self,
+        embedding: List[float],
+        k: int,
+        filters: Optional[Dict] = None
+    ):
+        """Search the vector store with a precomputed query embedding"""
+        if isinstance(self.vector_store, FAISS):
+            # Tombstoned positions are skipped inside faiss, so exactly k
+            # live neighbours come back however many deletes are pending
+            store = self.vector_store
+            vector = np.array([embedding], dtype=np.float32)
+            if getattr(store, '_normalize_L2', False):
+                faiss.normalize_L2(vector)
+            distances, positions = store.index.search(vector, k, params=self._search_params)
+            return [
+                (store.docstore.search(store.index_to_docstore_id[position]), float(distance))
+                for position, distance in zip(positions[0], distances[0])
+                if position != -1
+            ]
+        return self.vector_store.similarity_search_by_vector_with_relevance_scores(
+            embedding,
+            k=k,
+            filter=filters
+        )
+
     async def add_document(
         self, 
         content: str, 
         metadata: Optional[Dict] = None
     ) -> List[str]:
         """Add a document to the vector store"""
+        self._ensure_writer()
+        
         # Split document into chunks
         chunks = self.text_splitter.split_text(content)
         
@@ -62,20 +189,22 @@ class RAGService:
                 'chunk_id': i,
                 'timestamp': datetime.utcnow().isoformat(),
                 'source': metadata.get('source', 'unknown') if metadata else 'unknown',
-                **metadata if metadata else {}
+                **(metadata or {})
             }
             chunk_metadata.append(chunk_meta)
 
         # Add to vector store
         try:
-            self.vector_store.add_texts(
-                texts=chunks,
-                metadatas=chunk_metadata
-            )
+            async with self._index_lock:
+                self.vector_store.add_texts(
+                    texts=chunks,
+                    metadatas=chunk_metadata
+                )
             
-            # If using FAISS, save the index
-            if isinstance(self.vector_store, FAISS):
-                self.vector_store.save_local(self.config.FAISS_INDEX_PATH)
+            # If using FAISS, schedule a debounced save of the index
+            if self.persistence is not None:
+                self._maybe_compact()
+                self.persistence.mark_dirty()
                 
             return chunks
         except Exception as e:
@@ -91,10 +220,8 @@ class RAGService:
         """Retrieve relevant context for a query"""
         try:
             # Get similar documents with scores
-            docs_and_scores = self.vector_store.similarity_search_with_score(
-                query,
-                k=num_chunks
-            )
+            query_embedding = await self.embedder.embed(query)
+            docs_and_scores = self._search_by_vector(query_embedding, num_chunks)
             
             # Filter and format results
             relevant_contexts = []
@@ -113,35 +240,125 @@ class RAGService:
 
     async def delete_document(self, document_id: str):
         """Delete a document and its chunks from the vector store"""
+        self._ensure_writer()
+        
         try:
             # For Chroma
             if not isinstance(self.vector_store, FAISS):
                 self.vector_store.delete(
                     filter={"source_id": document_id}
                 )
-            # For FAISS (requires reimplementation of the index)
+            # For FAISS, tombstone the chunks in the docstore and compact later
             else:
-                # Get all documents except the one to delete
-                all_docs = self.vector_store.index_to_docstore_id
-                filtered_docs = {
-                    k: v for k, v in all_docs.items() 
-                    if v.get('source_id') != document_id
-                }
-                # Recreate index with filtered documents
-                new_texts = [doc.page_content for doc in filtered_docs.values()]
-                new_metadata = [doc.metadata for doc in filtered_docs.values()]
+                # The docstore is pickled by flushes, so mutate it under the index lock
+                async with self._index_lock:
+                    docstore = self.vector_store.docstore._dict
+                    doc_ids = [
+                        doc_id for doc_id in self.vector_store.index_to_docstore_id.values()
+                        if doc_id not in self._tombstones
+                        and docstore[doc_id].metadata.get('source_id') == document_id
+                    ]
+                    for doc_id in doc_ids:
+                        docstore[doc_id].metadata['_deleted'] = True
+                    self._tombstones.update(doc_ids)
+                    self._refresh_search_params()
                 
-                self.vector_store = FAISS.from_texts(
-                    new_texts,
-                    self.embeddings,
-                    metadatas=new_metadata
-                )
-                self.vector_store.save_local(self.config.FAISS_INDEX_PATH)
+                self._maybe_compact()
+                self.persistence.mark_dirty()
                 
         except Exception as e:
             print(f"Error deleting document: {e}")
             raise
 
+    def _target_index_type(self, live_vectors: int) -> str:
+        """Configured ANN type once the corpus is large enough, exact search before"""
+        index_type = self.config.FAISS_INDEX_TYPE
+        if live_vectors < faiss_index.min_vectors(index_type, self.config):
+            return "flat"
+        return index_type
+
+    def _maybe_compact(self):
+        """Schedule a background rebuild once the tombstone ratio is crossed
+        or the corpus has outgrown its current index type"""
+        total = self.vector_store.index.ntotal
+        if not total:
+            return
+        needs_compaction = len(self._tombstones) / total >= self.config.FAISS_TOMBSTONE_RATIO
+        needs_migration = (
+            faiss_index.index_type_of(self.vector_store.index)
+            != self._target_index_type(total - len(self._tombstones))
+        )
+        if not (needs_compaction or needs_migration):
+            return
+        if self._compaction_task and not self._compaction_task.done():
+            return
+        self._compaction_task = asyncio.create_task(self._compact())
+
+    async def _compact(self):
+        """Rebuild the index without tombstoned vectors and without re-embedding"""
+        async with self._index_lock:
+            store = self.vector_store
+            tombstones = set(self._tombstones)
+            try:
+                index, index_to_docstore_id = await asyncio.to_thread(
+                    self._build_compacted_index, store, tombstones
+                )
+            except Exception as e:
+                print(f"Error compacting FAISS index: {e}")
+                return
+            
+            store.index = index
+            store.index_to_docstore_id = index_to_docstore_id
+            for doc_id in tombstones:
+                store.docstore._dict.pop(doc_id, None)
+            self._tombstones -= tombstones
+            self._refresh_search_params()
+            self.persistence.mark_dirty()
+
+    def _build_compacted_index(self, store: FAISS, tombstones: Set[str]):
+        """Rebuild the index from its own stored vectors, skipping tombstones"""
+        live = [
+            (position, doc_id)
+            for position, doc_id in sorted(store.index_to_docstore_id.items())
+            if doc_id not in tombstones
+        ]
+        positions = np.array([position for position, _ in live], dtype=np.int64)
+        current_type = faiss_index.index_type_of(store.index)
+        target_type = self._target_index_type(len(live))
+        
+        if faiss_index.is_lossy(current_type) and target_type == current_type:
+            # Reconstructed PQ vectors are approximations; retraining on them
+            # compounds the error every rebuild, so move the stored codes instead
+            index = faiss_index.compact_ivf(store.index, positions)
+        else:
+            # Lossless for flat/HNSW/IVF-Flat; a migration away from PQ pays
+            # the approximation once
+            vectors = faiss_index.reconstruct_all(store.index, positions)
+            index = faiss_index.build_index(vectors, self.config, target_type)
+        return index, {i: doc_id for i, (_, doc_id) in enumerate(live)}
+
+    def set_search_params(
+        self,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ):
+        """Tune IVF nprobe or HNSW efSearch on the live index"""
+        if isinstance(self.vector_store, FAISS):
+            faiss_index.apply_search_params(self.vector_store.index, nprobe, ef_search)
+            self._refresh_search_params()
+
+    def _refresh_search_params(self):
+        """Rebuild the per-query parameters after tombstones or search knobs change"""
+        store = self.vector_store
+        excluded = np.array(
+            [
+                position for position, doc_id in store.index_to_docstore_id.items()
+                if doc_id in self._tombstones
+            ],
+            dtype=np.int64
+        )
+        self._search_params = faiss_index.search_params(store.index, excluded)
+
     async def search_documents(
         self,
         query: str,
@@ -150,19 +367,13 @@ class RAGService:
     ) -> List[Dict]:
         """Search documents with optional metadata filters"""
         try:
+            query_embedding = await self.embedder.embed(query)
             if filters and not isinstance(self.vector_store, FAISS):
                 # Chroma supports metadata filtering
-                results = self.vector_store.similarity_search_with_score(
-                    query,
-                    k=limit,
-                    filter=filters
-                )
+                results = self._search_by_vector(query_embedding, limit, filters)
             else:
                 # Basic search for FAISS
-                results = self.vector_store.similarity_search_with_score(
-                    query,
-                    k=limit
-                )
+                results = self._search_by_vector(query_embedding, limit)
             
             return [{
                 'content': doc.page_content,
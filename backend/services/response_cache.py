@@ -0,0 +1,122 @@
+# backend/services/response_cache.py
+
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import time
+import uuid
+import numpy as np
+
+class SemanticResponseCache:
+    """Reuses answers for semantically similar prompts.
+
+    A stored answer is returned when a new query embedding is within
+    `threshold` cosine similarity of a cached one, the fingerprint of the
+    retrieved context and prior conversation turns matches and the entry has
+    not expired. Including the turns keeps a follow-up like "why?" from
+    reusing an answer given in a different conversation. Entries are scoped
+    per user or globally and evicted least-recently-used.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl: int = 3600,
+        max_entries: int = 1000,
+        scope: str = "user"
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.scope = scope
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def _scope_key(self, user_id: Optional[str]) -> str:
+        return user_id if self.scope == "user" and user_id else "global"
+
+    @staticmethod
+    def fingerprint(
+        context: Any,
+        history: Optional[List[Any]] = None,
+        summary: str = ""
+    ) -> str:
+        """Hash the retrieved context content and the prior turns, ignoring scores"""
+        if isinstance(context, list):
+            context = [
+                ctx.get("content") if isinstance(ctx, dict) else ctx
+                for ctx in context
+            ]
+        turns = [(message.role, message.content) for message in history or []]
+        payload = {"context": context, "history": turns, "summary": summary}
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(
+        self,
+        embedding,
+        context: Any,
+        user_id: Optional[str] = None,
+        history: Optional[List[Any]] = None,
+        summary: str = ""
+    ) -> Optional[Dict]:
+        """Return the best cached answer above the similarity threshold"""
+        scope = self._scope_key(user_id)
+        fingerprint = self.fingerprint(context, history, summary)
+        query = self._normalize(embedding)
+        now = time.time()
+
+        best_id, best_score = None, self.threshold
+        for entry_id, entry in list(self._entries.items()):
+            if entry["expires_at"] <= now:
+                del self._entries[entry_id]
+                continue
+            if entry["scope"] != scope or entry["fingerprint"] != fingerprint:
+                continue
+            score = float(np.dot(query, entry["embedding"]))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            return None
+
+        self._entries.move_to_end(best_id)
+        return {
+            "response": self._entries[best_id]["response"],
+            "similarity": best_score
+        }
+
+    def store(
+        self,
+        embedding,
+        context: Any,
+        response: str,
+        user_id: Optional[str] = None,
+        history: Optional[List[Any]] = None,
+        summary: str = ""
+    ):
+        self._entries[str(uuid.uuid4())] = {
+            "scope": self._scope_key(user_id),
+            "fingerprint": self.fingerprint(context, history, summary),
+            "embedding": self._normalize(embedding),
+            "response": response,
+            "expires_at": time.time() + self.ttl
+        }
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop every entry in a user's scope, or everything when no user is given"""
+        if user_id is None:
+            self._entries.clear()
+            return
+        scope = self._scope_key(user_id)
+        for entry_id in [k for k, v in self._entries.items() if v["scope"] == scope]:
+            del self._entries[entry_id]
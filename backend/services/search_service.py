@@ -0,0 +1,162 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
+from ..models.conversation import (
+    Conversation,
+    Message,
+    CONVERSATION_TSVECTOR,
+    MESSAGE_TSVECTOR
+)
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+
+PG_CONVERSATION_SEARCH = text(f"""
+    SELECT c.id AS conversation_id, c.title AS title, NULL AS message_id,
+           ts_rank({CONVERSATION_TSVECTOR}, q) AS rank,
+           ts_headline(
+               'english',
+               coalesce(c.title, '') || ' ' || coalesce(c.description, ''),
+               q,
+               :headline_options
+           ) AS snippet
+    FROM conversations c, websearch_to_tsquery('english', :query) q
+    WHERE c.user_id = :user_id AND {CONVERSATION_TSVECTOR} @@ q
+    ORDER BY rank DESC
+    LIMIT :limit
+""")
+
+PG_MESSAGE_SEARCH = text(f"""
+    SELECT m.conversation_id AS conversation_id, c.title AS title, m.id AS message_id,
+           ts_rank({MESSAGE_TSVECTOR}, q) AS rank,
+           ts_headline('english', m.content, q, :headline_options) AS snippet
+    FROM messages m
+    JOIN conversations c ON c.id = m.conversation_id,
+         websearch_to_tsquery('english', :query) q
+    WHERE c.user_id = :user_id AND {MESSAGE_TSVECTOR} @@ q
+    ORDER BY rank DESC
+    LIMIT :limit
+""")
+
+# bm25() is lower-is-better, so negate it to share "higher rank wins" with Postgres
+SQLITE_CONVERSATION_SEARCH = text(f"""
+    SELECT f.conversation_id AS conversation_id, c.title AS title, NULL AS message_id,
+           -bm25(conversations_fts) AS rank,
+           snippet(conversations_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '...', 16) AS snippet
+    FROM conversations_fts f
+    JOIN conversations c ON c.id = f.conversation_id
+    WHERE conversations_fts MATCH :query AND f.user_id = :user_id
+    ORDER BY rank DESC
+    LIMIT :limit
+""")
+
+SQLITE_MESSAGE_SEARCH = text(f"""
+    SELECT f.conversation_id AS conversation_id, c.title AS title, f.message_id AS message_id,
+           -bm25(messages_fts) AS rank,
+           snippet(messages_fts, 3, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '...', 16) AS snippet
+    FROM messages_fts f
+    JOIN conversations c ON c.id = f.conversation_id
+    WHERE messages_fts MATCH :query AND f.user_id = :user_id
+    ORDER BY rank DESC
+    LIMIT :limit
+""")
+
+class SearchService:
+    """Ranked full-text search over conversations and messages.
+
+    PostgreSQL uses GIN-indexed tsvector expressions, which the database keeps
+    current on every write. SQLite falls back to FTS5 tables that the
+    conversation service updates as rows are written.
+    """
+
+    @staticmethod
+    def _is_sqlite(db: AsyncSession) -> bool:
+        return db.get_bind().dialect.name == "sqlite"
+
+    @staticmethod
+    def _fts5_query(query: str) -> str:
+        # Quote each term so user input cannot inject FTS5 operators
+        return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+    async def index_conversation(self, db: AsyncSession, conversation: Conversation):
+        if not self._is_sqlite(db):
+            return
+        await db.execute(
+            text("DELETE FROM conversations_fts WHERE conversation_id = :id"),
+            {"id": conversation.id}
+        )
+        await db.execute(
+            text(
+                "INSERT INTO conversations_fts (conversation_id, user_id, title, description) "
+                "VALUES (:id, :user_id, :title, :description)"
+            ),
+            {
+                "id": conversation.id,
+                "user_id": conversation.user_id,
+                "title": conversation.title or "",
+                "description": conversation.description or ""
+            }
+        )
+
+    async def index_message(self, db: AsyncSession, message: Message, user_id: str):
+        await self.index_messages(db, [{
+            "id": message.id,
+            "conversation_id": message.conversation_id,
+            "user_id": user_id,
+            "content": message.content
+        }])
+
+    async def index_messages(self, db: AsyncSession, rows: List[Dict]):
+        """Index many messages at once; rows carry id, conversation_id, user_id and content"""
+        if not rows or not self._is_sqlite(db):
+            return
+        await db.execute(
+            text(
+                "INSERT INTO messages_fts (message_id, conversation_id, user_id, content) "
+                "VALUES (:id, :conversation_id, :user_id, :content)"
+            ),
+            rows
+        )
+
+    async def search(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        query: str,
+        include_messages: bool = False,
+        limit: int = 20
+    ) -> List[Dict]:
+        """Return the best-ranked hit per conversation with a highlighted snippet"""
+        if not query.strip():
+            return []
+
+        if self._is_sqlite(db):
+            statements = [SQLITE_CONVERSATION_SEARCH]
+            if include_messages:
+                statements.append(SQLITE_MESSAGE_SEARCH)
+            params = {"query": self._fts5_query(query), "user_id": user_id, "limit": limit}
+        else:
+            statements = [PG_CONVERSATION_SEARCH]
+            if include_messages:
+                statements.append(PG_MESSAGE_SEARCH)
+            params = {
+                "query": query,
+                "user_id": user_id,
+                "limit": limit,
+                "headline_options": (
+                    f"StartSel={HIGHLIGHT_START},StopSel={HIGHLIGHT_STOP},MaxFragments=2"
+                )
+            }
+
+        best: Dict[str, Dict] = {}
+        for statement in statements:
+            result = await db.execute(statement, params)
+            for row in result.mappings():
+                hit = dict(row)
+                current = best.get(hit["conversation_id"])
+                if current is None or hit["rank"] > current["rank"]:
+                    best[hit["conversation_id"]] = hit
+
+        return sorted(best.values(), key=lambda hit: hit["rank"], reverse=True)[:limit]
+
+search_service = SearchService()
@@ -0,0 +1,24 @@
+# backend/tests/conftest.py
+
+import os
+
+# Settings are read at import time; keep tests off real services
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import Column, String
+from sqlalchemy.orm import relationship
+from backend.database.db import Base
+
+class DBUser(Base):
+    """The users table, mapped on the models' Base.
+
+    DBUser in database/models.py lives on a separate Base, so the foreign keys
+    and `user` relationships of the conversation models cannot resolve it.
+    """
+    __tablename__ = "users"
+
+    id = Column(String, primary_key=True)
+    conversations = relationship("Conversation", back_populates="user")
+    folders = relationship("Folder", back_populates="user")
+    tags = relationship("Tag", back_populates="user")
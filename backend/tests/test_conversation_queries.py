@@ -0,0 +1,104 @@
+# backend/tests/test_conversation_queries.py
+
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from backend.database.db import Base
+from backend.database.query_counter import assert_max_queries
+from backend.models.conversation import Conversation, Folder, Message, Tag
+from backend.schemas.conversation import ConversationResponse
+from backend.services.conversation_service import conversation_service
+
+USER_ID = "user-1"
+CONVERSATIONS = 20
+
+async def _seed_engine():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with sessions() as db:
+        folder = Folder(id="folder-1", user_id=USER_ID, name="Work")
+        tags = [Tag(id=f"tag-{i}", user_id=USER_ID, name=f"tag {i}") for i in range(3)]
+        now = datetime.utcnow()
+        for i in range(CONVERSATIONS):
+            conversation = Conversation(
+                id=f"conversation-{i:02d}",
+                user_id=USER_ID,
+                title=f"Conversation {i}",
+                folder=folder if i % 2 else None,
+                updated_at=now - timedelta(minutes=i)
+            )
+            conversation.tags = tags[: i % 4]
+            conversation.messages = [
+                Message(role="user" if j % 2 == 0 else "assistant", content=f"message {j}")
+                for j in range(5)
+            ]
+            db.add(conversation)
+        await db.commit()
+    return engine, sessions
+
+def _run(test):
+    async def main():
+        engine, sessions = await _seed_engine()
+        try:
+            async with sessions() as db:
+                await test(engine, db)
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+def test_get_conversations_query_count_is_constant():
+    async def test(engine, db):
+        # One query for the page (folder joined) plus one selectin for tags
+        with assert_max_queries(2, engine):
+            conversations, next_cursor = await conversation_service.get_conversations(
+                db, USER_ID, limit=CONVERSATIONS
+            )
+        assert len(conversations) == CONVERSATIONS
+        assert next_cursor is None
+        # Serializing tags and folder must not touch the database again
+        with assert_max_queries(0, engine):
+            for conversation in conversations:
+                ConversationResponse.model_validate(conversation)
+    _run(test)
+
+def test_get_conversations_filters_keep_query_count():
+    async def test(engine, db):
+        with assert_max_queries(2, engine):
+            by_tag, _ = await conversation_service.get_conversations(
+                db, USER_ID, tag_ids=["tag-0"]
+            )
+        with assert_max_queries(2, engine):
+            by_folder, _ = await conversation_service.get_conversations(
+                db, USER_ID, folder_id="folder-1"
+            )
+        assert by_tag and all("tag-0" in [tag.id for tag in c.tags] for c in by_tag)
+        assert by_folder and all(c.folder_id == "folder-1" for c in by_folder)
+    _run(test)
+
+def test_get_conversations_never_loads_messages():
+    async def test(engine, db):
+        with assert_max_queries(2, engine) as counter:
+            await conversation_service.get_conversations(db, USER_ID)
+        assert not any("FROM messages" in statement for statement in counter.statements)
+    _run(test)
+
+def test_get_conversation_query_count():
+    async def test(engine, db):
+        # Conversation with its folder, then one selectin each for tags and messages
+        with assert_max_queries(3, engine):
+            conversation = await conversation_service.get_conversation(
+                db, "conversation-03", USER_ID
+            )
+        with assert_max_queries(0, engine):
+            assert len(conversation.messages) == 5
+            assert len(conversation.tags) == 3
+            assert conversation.folder.name == "Work"
+    _run(test)
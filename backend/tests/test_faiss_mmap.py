@@ -0,0 +1,44 @@
+# backend/tests/test_faiss_mmap.py
+
+import os
+import faiss
+import numpy as np
+import pytest
+from backend.services import faiss_index
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists("/proc/self/smaps_rollup"), reason="needs Linux /proc accounting"
+)
+
+def _anonymous_kb() -> int:
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Anonymous:"):
+                return int(line.split()[1])
+    return 0
+
+def _is_mapped(path: str) -> bool:
+    with open("/proc/self/maps") as f:
+        return any(line.rstrip().endswith(path) for line in f)
+
+@pytest.mark.parametrize("factory", ["Flat", "HNSW16", "IVF16,Flat"])
+def test_read_index_mapped_shares_storage(tmp_path, factory):
+    vectors = np.random.default_rng(0).random((20000, 128), dtype=np.float32)
+    index = faiss.index_factory(128, factory)
+    index.train(vectors)
+    index.add(vectors)
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(index, path)
+    del index
+
+    before = _anonymous_kb()
+    mapped = faiss_index.read_index_mapped(path)
+    grown_kb = _anonymous_kb() - before
+
+    assert _is_mapped(path)
+    # The stored vectors (~10 MB) stay in the file mapping, not private memory
+    assert grown_kb < vectors.nbytes // 1024 // 4
+    # Same answers as an index read into memory
+    _, expected = faiss.read_index(path).search(vectors[:5], 3)
+    _, labels = mapped.search(vectors[:5], 3)
+    np.testing.assert_array_equal(labels, expected)
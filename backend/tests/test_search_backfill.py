@@ -0,0 +1,50 @@
+# backend/tests/test_search_backfill.py
+
+import asyncio
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from backend.database.db import Base
+from backend.models.conversation import Conversation, Message
+from backend.services.search_service import search_service
+
+USER_ID = "user-1"
+
+def test_create_all_backfills_fts_tables():
+    async def main():
+        engine = create_async_engine(
+            "sqlite+aiosqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                # Rows written before the FTS5 tables existed
+                await conn.execute(text("DROP TABLE conversations_fts"))
+                await conn.execute(text("DROP TABLE messages_fts"))
+                await conn.execute(insert(Conversation), [
+                    {"id": "c1", "user_id": USER_ID, "title": "Quarterly planning"}
+                ])
+                await conn.execute(insert(Message), [
+                    {"id": "m1", "conversation_id": "c1", "role": "user",
+                     "content": "draft the budget spreadsheet"}
+                ])
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                # A second run must not index the rows again
+                await conn.run_sync(Base.metadata.create_all)
+
+            sessions = async_sessionmaker(engine, class_=AsyncSession)
+            async with sessions() as db:
+                by_title = await search_service.search(db, USER_ID, "planning")
+                by_message = await search_service.search(
+                    db, USER_ID, "spreadsheet", include_messages=True
+                )
+                indexed = await db.scalar(text("SELECT count(*) FROM messages_fts"))
+            assert [hit["conversation_id"] for hit in by_title] == ["c1"]
+            assert [hit["message_id"] for hit in by_message] == ["m1"]
+            assert indexed == 1
+        finally:
+            await engine.dispose()
+    asyncio.run(main())